@@ -1,19 +1,27 @@
 """The GEN2 Wallbox integration."""
 
 from __future__ import annotations
-from datetime import timedelta
 
 import asyncio
 import logging
+import os
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers.entity import DeviceInfo
-from homeassistant.helpers.event import async_track_time_interval
 
+from .balancer import SiteBalancer
 from .const import *
+from .coordinator import GEN2WallboxCoordinator, status_store
+from .gen2_wallbox_tinytuya.codec import import_cipher
+from .gen2_wallbox_tinytuya.discovery import DiscoveryListener
 from .gen2_wallbox_tinytuya.gen2wallbox import GEN2_Wallbox
+from .gen2_wallbox_tinytuya.poll_rate import AdaptivePollInterval
+from .gen2_wallbox_tinytuya.scheduler import PollScheduler
+from .services import async_setup_services, async_unload_services
+from .surplus import async_setup_surplus
 
 import voluptuous as vol
 from homeassistant.helpers import config_validation as cv
@@ -25,7 +33,23 @@ config = {}
 
 CONFIG_SCHEMA = vol.Schema(
     {
-        DOMAIN: vol.Schema({vol.Optional("update_interval"): int}),
+        DOMAIN: vol.Schema(
+            {
+                vol.Optional("update_interval"): int,
+                vol.Optional("consistency_interval"): int,
+                vol.Optional("idle_interval"): int,
+                vol.Optional("max_backoff_interval"): int,
+                vol.Optional("state_heartbeat"): int,
+                vol.Optional("max_concurrent_polls"): vol.All(
+                    vol.Coerce(int), vol.Range(min=1)
+                ),
+                vol.Optional("site_current_limit"): vol.All(
+                    vol.Coerce(float), vol.Range(min=0)
+                ),
+                vol.Optional("site_current_entity"): cv.entity_id,
+                vol.Optional("record_traffic"): cv.isdir,
+            }
+        ),
     },
     extra=vol.ALLOW_EXTRA,
 )
@@ -40,6 +64,17 @@ async def async_setup(hass, config) -> bool:
 
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN]["CONFIG"] = conf
+    # importing the AES backend reads many files, not on the event loop
+    await hass.async_add_executor_job(import_cipher)
+    # all wallboxes share one scheduler so polls run side by side
+    hass.data[DOMAIN]["scheduler"] = PollScheduler(
+        conf.get("max_concurrent_polls", DEFAULT_MAX_CONCURRENT_POLLS)
+    )
+    # one current budget for all wallboxes of the site
+    if "site_current_limit" in conf or "site_current_entity" in conf:
+        hass.data[DOMAIN]["balancer"] = SiteBalancer(
+            hass, conf.get("site_current_limit"), conf.get("site_current_entity")
+        )
 
     return True
 
@@ -56,6 +91,30 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         wallbox.car_phases = int(entry.data["car_phases"])
 
     wallbox.config = hass.data[DOMAIN]["CONFIG"]
+    wallbox.scheduler = hass.data[DOMAIN]["scheduler"]
+    # traffic log for reproducing problems, replayed by recording.ReplayClient
+    if record_dir := wallbox.config.get("record_traffic"):
+        await wallbox.async_start_recording(
+            os.path.join(record_dir, f'{entry.data["deviceid"]}.jsonl')
+        )
+
+    # entry ip stays the identity of the wallbox, host is where it is now
+    discovery = await async_get_discovery(hass)
+    deviceid = entry.data["deviceid"]
+    wallbox.device.host = discovery.lookup(deviceid) or entry.data.get(
+        "host", entry.data["ip"]
+    )
+
+    @callback
+    def follow_wallbox(host):
+        if host == wallbox.host:
+            return
+        hass.config_entries.async_update_entry(entry, data={**entry.data, "host": host})
+        entry.async_create_background_task(
+            hass, wallbox.async_rebind(host), f"{DOMAIN} rebind {wallbox.ip}"
+        )
+
+    entry.async_on_unload(discovery.subscribe(deviceid, follow_wallbox))
 
     name = "GEN2 WB"
     if "name" in entry.data:
@@ -72,56 +131,62 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         sw_version="1.0.0",
     )
 
-    update_interval = 10
-    if "update_interval" in wallbox.config:
-        update_interval = int(wallbox.config["update_interval"])
-
-    # periodical update of the state
-    _LOGGER.debug(f"Starting async update task with interval {update_interval} sec")
-    async_track_time_interval(hass, wallbox.update, timedelta(seconds=update_interval))
-
-    hass.data[DOMAIN][entry.entry_id] = wallbox
-
-    def increase_current(call):
-        _LOGGER.debug("call INCREASE_CURRENT")
-        entity_id = call.data.get("entity_id")
-        entity = hass.states.get(entity_id)
-        if not entity is None and entity.state != "unavailable":
-            actual = int(entity.state)
-            if actual < MAX_CURRENT:
-                wallbox.set_value("Set32A", actual + 1)
-
-    def decrease_current(call):
-        _LOGGER.debug("call DECREASE")
-        entity_id = call.data.get("entity_id")
-        entity = hass.states.get(entity_id)
-        if not entity is None and entity.state != "unavailable":
-            actual = int(entity.state)
-            if actual > MIN_CURRENT:
-                wallbox.set_value("Set32A", actual - 1)
-
-    def set_minimal_current(call):
-        _LOGGER.debug("call minimal current")
-        entity_id = call.data.get("entity_id")
-        entity = hass.states.get(entity_id)
-        if not entity is None and entity.state != "unavailable":
-            actual = int(entity.state)
-            if actual > MIN_CURRENT:
-                wallbox.set_value("Set32A", MIN_CURRENT)
-
-    def set_maximal_current(call):
-        _LOGGER.debug("call minimal current")
-        entity_id = call.data.get("entity_id")
-        entity = hass.states.get(entity_id)
-        if not entity is None and entity.state != "unavailable":
-            actual = int(entity.state)
-            if actual < MIN_CURRENT:
-                wallbox.set_value("Set32A", MAX_CURRENT)
-
-    hass.services.async_register(DOMAIN, "increase_current", increase_current)
-    hass.services.async_register(DOMAIN, "decrease_current", decrease_current)
-    hass.services.async_register(DOMAIN, "set_minimal_current", set_minimal_current)
-    hass.services.async_register(DOMAIN, "set_maximal_current", set_maximal_current)
+    if "consistency_interval" in wallbox.config:
+        wallbox.consistency_interval = int(wallbox.config["consistency_interval"])
+
+    # poll fast while charging, slowly when idle, back off when offline
+    wallbox.poll_rate = AdaptivePollInterval(
+        active=int(wallbox.config.get("update_interval", DEFAULT_UPDATE_INTERVAL)),
+        idle=int(wallbox.config.get("idle_interval", DEFAULT_IDLE_INTERVAL)),
+        max_backoff=int(
+            wallbox.config.get("max_backoff_interval", DEFAULT_MAX_BACKOFF_INTERVAL)
+        ),
+    )
+
+    # one periodical fetch shared by all entities
+    _LOGGER.debug(f"Starting coordinator with interval {wallbox.poll_interval} sec")
+    coordinator = GEN2WallboxCoordinator(
+        hass,
+        wallbox,
+        int(wallbox.config.get("state_heartbeat", DEFAULT_STATE_HEARTBEAT)),
+        entry.entry_id,
+    )
+    await coordinator.async_restore()
+
+    if wallbox.snapshot is None:
+        # nothing restored to show: wait briefly for the wallbox and let HA
+        # retry the entry with its backoff when it does not answer in time
+        try:
+            async with asyncio.timeout(FIRST_REFRESH_TIMEOUT):
+                await coordinator.async_refresh()
+        except TimeoutError:
+            pass
+        if wallbox.snapshot is None:
+            await coordinator.async_shutdown()
+            raise ConfigEntryNotReady(f"Wallbox {wallbox.ip} is not answering")
+    else:
+        # the restored status is shown until the refresh finishes
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN} first refresh {wallbox.ip}"
+        )
+
+    hass.data[DOMAIN][entry.entry_id] = coordinator
+    # registered with the first wallbox, removed with the last one
+    async_setup_services(hass)
+
+    async_setup_surplus(hass, entry, wallbox)
+    if (balancer := hass.data[DOMAIN].get("balancer")) is not None:
+        priority = entry.options.get("priority", DEFAULT_PRIORITY)
+        entry.async_on_unload(balancer.add(entry.entry_id, coordinator, priority))
+
+    options = dict(entry.options)
+
+    async def reload_on_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+        # the entry data also changes when the wallbox moves, that needs no reload
+        if entry.options != options:
+            await hass.config_entries.async_reload(entry.entry_id)
+
+    entry.async_on_unload(entry.add_update_listener(reload_on_options))
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
@@ -131,11 +196,34 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        # polls in flight are cancelled, the session closed
+        await coordinator.async_shutdown()
+        if not any(
+            isinstance(value, GEN2WallboxCoordinator)
+            for value in hass.data[DOMAIN].values()
+        ):
+            async_unload_services(hass)
+            if (discovery := hass.data[DOMAIN].pop("discovery", None)) is not None:
+                discovery.close()
 
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Delete the saved status of a removed wallbox."""
+    await status_store(hass, entry.entry_id).async_remove()
+
+
+async def async_get_discovery(hass: HomeAssistant) -> DiscoveryListener:
+    """The beacon listener shared by all wallboxes, started on first use."""
+    if "discovery" not in hass.data[DOMAIN]:
+        discovery = DiscoveryListener()
+        hass.data[DOMAIN]["discovery"] = discovery
+        await discovery.async_start()
+    return hass.data[DOMAIN]["discovery"]
+
+
 async def async_migrate_entry(hass, config_entry: ConfigEntry):
     """Migrate old entry."""
     _LOGGER.debug("Migrating from version %s", config_entry.version)
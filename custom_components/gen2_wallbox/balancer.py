@@ -0,0 +1,149 @@
+"""Site current budget shared by all charging wallboxes."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from homeassistant.const import UnitOfElectricCurrent, UnitOfPower
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_state_change_event
+
+from .const import MAX_CURRENT, MIN_CURRENT
+from .coordinator import GEN2WallboxCoordinator
+from .gen2_wallbox_tinytuya.balancer import Demand, allocate
+from .gen2_wallbox_tinytuya.energy import NOMINAL_VOLTAGE
+
+_LOGGER = logging.getLogger(__name__)
+
+_POWER_UNITS = {UnitOfPower.WATT: 1, UnitOfPower.KILO_WATT: 1000}
+
+
+class SiteBalancer:
+    """Keeps the Set32A of all charging wallboxes within the site budget.
+
+    The budget is site_current_limit (A per phase) or the state of
+    site_current_entity, in A per phase or in W / kW. In amps every charging
+    wallbox counts with its setpoint, as single phase cars may all be on
+    the same phase; in watts with setpoint x voltage x car_phases.
+
+    The budget sensor is followed while at least one wallbox is balanced.
+    A setpoint above its share, e.g. changed in the Tuya app, is written
+    again; a lower one, from a user or the surplus control, is kept.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        limit: float | None = None,
+        budget_entity: str | None = None,
+    ) -> None:
+        self.hass = hass
+        self.limit = limit
+        self.budget_entity = budget_entity
+        self._members: dict[str, tuple[GEN2WallboxCoordinator, float]] = {}
+        self._allocated: dict[str, int] = {}
+        self._overcommitted = False
+        self._bad_unit = None
+        self._unsub = None
+
+    @callback
+    def async_start(self) -> None:
+        if self.budget_entity is not None and self._unsub is None:
+            self._unsub = async_track_state_change_event(
+                self.hass, [self.budget_entity], self._handle_budget
+            )
+
+    @callback
+    def async_stop(self) -> None:
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+
+    @callback
+    def add(self, key: str, coordinator: GEN2WallboxCoordinator, priority: float):
+        """Balance the wallbox of a coordinator; returns the removal callback."""
+        self._members[key] = (coordinator, priority)
+        unsub = coordinator.async_add_listener(self.async_rebalance)
+        self.async_start()
+
+        @callback
+        def remove() -> None:
+            unsub()
+            self._members.pop(key, None)
+            self._allocated.pop(key, None)
+            coordinator.wallbox.current_limit = None
+            if not self._members:
+                self.async_stop()
+            self.async_rebalance()
+
+        return remove
+
+    def budget(self) -> tuple[float, bool] | None:
+        """Budget and whether it is a power, None when unknown."""
+        if self.budget_entity is not None:
+            state = self.hass.states.get(self.budget_entity)
+            try:
+                value = float(state.state)
+            except (AttributeError, ValueError):
+                pass
+            else:
+                unit = state.attributes.get("unit_of_measurement")
+                if unit in _POWER_UNITS:
+                    return value * _POWER_UNITS[unit], True
+                if unit in (None, UnitOfElectricCurrent.AMPERE):
+                    return value, False
+                if unit != self._bad_unit:
+                    _LOGGER.warning(f"{self.budget_entity}: unsupported unit {unit}")
+                self._bad_unit = unit
+        if self.limit is not None:
+            return self.limit, False
+        return None
+
+    @callback
+    def _handle_budget(self, event: Event) -> None:
+        self.async_rebalance()
+
+    @callback
+    def async_rebalance(self) -> None:
+        """Reallocate the budget, lowering the setpoints above their share."""
+        if (budget := self.budget()) is None:
+            return
+        value, power = budget
+        demands = []
+        for key, (coordinator, priority) in self._members.items():
+            wallbox = coordinator.wallbox
+            if not wallbox.available or not wallbox.is_charging():
+                if self._allocated.pop(key, None) is not None:
+                    wallbox.current_limit = None
+                continue
+            cost = 1.0
+            if power:
+                voltage = wallbox.snapshot.voltage or NOMINAL_VOLTAGE
+                cost = voltage * wallbox.car_phases
+            demands.append(Demand(key, cost, priority, MIN_CURRENT, MAX_CURRENT))
+
+        allocation = allocate(value, demands)
+        overcommitted = sum(d.cost * allocation[d.key] for d in demands) > value
+        if overcommitted and not self._overcommitted:
+            _LOGGER.warning(f"Site budget {value} too low for {len(demands)} cars")
+        self._overcommitted = overcommitted
+        writes = []
+        for key, current in allocation.items():
+            wallbox = self._members[key][0].wallbox
+            if self._allocated.get(key) != current:
+                self._allocated[key] = current
+                wallbox.current_limit = current
+                _LOGGER.debug(f"{wallbox.ip}: site allocation {current} A")
+            # only ever lowered, a setpoint below the share stays
+            setpoint = wallbox.target_current
+            if setpoint is None or setpoint > current:
+                writes.append(wallbox.request_value("Set32A", current))
+        if writes:
+            self.hass.async_create_task(self._async_confirm(writes))
+
+    async def _async_confirm(self, writes) -> None:
+        # the writers of the wallboxes run side by side, just log failures
+        for result in await asyncio.gather(*writes, return_exceptions=True):
+            if isinstance(result, Exception):
+                _LOGGER.warning(f"Site allocation not written: {result}")
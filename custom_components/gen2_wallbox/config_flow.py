@@ -8,13 +8,19 @@ from typing import Any
 import voluptuous as vol
 
 from homeassistant import config_entries
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
-from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import config_validation as cv, selector
 
-from .const import DOMAIN
-from .gen2_wallbox_tinytuya.gen2wallbox import GEN2_Wallbox
+from .const import (
+    DEFAULT_PRIORITY,
+    DEFAULT_SURPLUS_HYSTERESIS,
+    DEFAULT_SURPLUS_INTERVAL,
+    DOMAIN,
+)
+from .gen2_wallbox_tinytuya.codec import import_cipher
+from .gen2_wallbox_tinytuya.protocol import ProbeResult, async_probe
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -37,22 +43,16 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str,
 
     Data has the keys from STEP_USER_DATA_SCHEMA with values provided by the user.
     """
-    _LOGGER.debug(f"(validate_input) data: {data}")
-    wallbox = GEN2_Wallbox(data["deviceid"], data["ip"], data["localkey"])
-
-    if data["name"]:
-        wallbox.name = data["name"]
-
-    if data["car_phases"]:
-        wallbox.car_phases = int(data["car_phases"])
+    _LOGGER.debug(f"(validate_input) ip: {data['ip']}, deviceid: {data['deviceid']}")
 
     if not data["test"]:
         _LOGGER.debug(f"testing conections")
-        status = wallbox.update()
-        _LOGGER.debug(status)
-
-        # if not wallbox.available:
-        #    raise CannotConnect()
+        await hass.async_add_executor_job(import_cipher)
+        # one short session with a hard deadline, never a blocking update
+        result = await async_probe(data["deviceid"], data["ip"], data["localkey"])
+        _LOGGER.debug(result)
+        if result != ProbeResult.OK:
+            raise CannotConnect(result.value)
 
     # Return info that you want to store in the config entry.
     return {"title": f'GEN2WB-f{data["ip"]}'}
@@ -75,8 +75,8 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
             try:
                 info = await validate_input(self.hass, user_input)
-            except CannotConnect:
-                errors["base"] = "cannot_connect"
+            except CannotConnect as e:
+                errors["base"] = str(e) or "cannot_connect"
             except Exception:  # pylint: disable=broad-except
                 _LOGGER.exception("Unexpected exception")
                 errors["base"] = "unknown"
@@ -87,6 +87,52 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
         )
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> config_entries.OptionsFlow:
+        return OptionsFlowHandler(config_entry)
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Solar surplus and load balancing options of a wallbox."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        self.entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self.entry.options
+        hysteresis = options.get("surplus_hysteresis", DEFAULT_SURPLUS_HYSTERESIS)
+        interval = options.get("surplus_interval", DEFAULT_SURPLUS_INTERVAL)
+        priority = options.get("priority", DEFAULT_PRIORITY)
+        schema = vol.Schema(
+            {
+                vol.Optional(
+                    "grid_power_entity",
+                    description={"suggested_value": options.get("grid_power_entity")},
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(domain="sensor", device_class="power")
+                ),
+                vol.Optional("surplus_hysteresis", default=hysteresis): vol.All(
+                    vol.Coerce(int), vol.Range(min=0)
+                ),
+                vol.Optional("surplus_interval", default=interval): vol.All(
+                    vol.Coerce(int), vol.Range(min=1)
+                ),
+                vol.Optional("priority", default=priority): vol.All(
+                    vol.Coerce(int), vol.Range(min=1, max=10)
+                ),
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=schema)
+
 
 class CannotConnect(HomeAssistantError):
     """Error to indicate we cannot connect."""
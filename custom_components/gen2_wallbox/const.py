@@ -1,6 +1,34 @@
 """Constants for the GEN2 Wallbox integration."""
 
+from .gen2_wallbox_tinytuya.poll_rate import (
+    ACTIVE_INTERVAL,
+    IDLE_INTERVAL,
+    MAX_BACKOFF_INTERVAL,
+)
+from .gen2_wallbox_tinytuya.scheduler import MAX_CONCURRENT_POLLS
+from .gen2_wallbox_tinytuya.surplus import SURPLUS_HYSTERESIS, SURPLUS_INTERVAL
+
 DOMAIN = "gen2_wallbox"
 
 MAX_CURRENT = 16
 MIN_CURRENT = 8
+
+# how long setup of a wallbox without a restored status waits for it to
+# answer before HA retries the entry later
+FIRST_REFRESH_TIMEOUT = 5
+
+# the defaults of the library are the ones of the integration
+DEFAULT_UPDATE_INTERVAL = ACTIVE_INTERVAL
+DEFAULT_IDLE_INTERVAL = IDLE_INTERVAL
+DEFAULT_MAX_BACKOFF_INTERVAL = MAX_BACKOFF_INTERVAL
+DEFAULT_MAX_CONCURRENT_POLLS = MAX_CONCURRENT_POLLS
+DEFAULT_STATE_HEARTBEAT = 300
+
+STORE_VERSION = 1
+# batch writes of the last known status
+STORE_SAVE_DELAY = 60
+
+# solar surplus controller, see the entry options
+DEFAULT_SURPLUS_HYSTERESIS = SURPLUS_HYSTERESIS
+DEFAULT_SURPLUS_INTERVAL = SURPLUS_INTERVAL
+DEFAULT_PRIORITY = 1
@@ -0,0 +1,115 @@
+"""Data update coordinator for the GEN2 Wallbox integration."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .const import (
+    DEFAULT_STATE_HEARTBEAT,
+    DOMAIN,
+    STORE_SAVE_DELAY,
+    STORE_VERSION,
+)
+from .gen2_wallbox_tinytuya.gen2wallbox import GEN2_Wallbox
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def status_store(hass: HomeAssistant, store_key: str) -> Store:
+    """Store of the last known status of one wallbox."""
+    return Store(hass, STORE_VERSION, f"{DOMAIN}.{store_key}")
+
+
+class GEN2WallboxCoordinator(DataUpdateCoordinator):
+    """One fetch per cycle for all entities of a wallbox, plus pushed reports."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        wallbox: GEN2_Wallbox,
+        state_heartbeat: int = DEFAULT_STATE_HEARTBEAT,
+        store_key: str | None = None,
+    ) -> None:
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN} {wallbox.ip}",
+            update_interval=timedelta(seconds=wallbox.poll_interval),
+        )
+        self.wallbox = wallbox
+        # entities rewrite an unchanged state at most this often
+        self.state_heartbeat = state_heartbeat
+        # last known status, so entities have values right after a restart
+        self._store = None
+        if store_key is not None:
+            self._store = status_store(hass, store_key)
+        wallbox.register_callback(self._handle_push)
+        self._remove_save_listener = self.async_add_listener(self._schedule_save)
+
+    async def async_restore(self) -> None:
+        """Serve the saved status as stale data until the device answers."""
+        if self._store is None:
+            return
+        if (saved := await self._store.async_load()) is None:
+            return
+        _LOGGER.debug(f"{self.wallbox.ip}: restoring status of {saved['timestamp']}")
+        self.wallbox.restore(saved["data"], saved["timestamp"])
+        self.async_set_updated_data(self.wallbox.get_data())
+
+    async def async_shutdown(self) -> None:
+        """Stop polling, write the pending status and close the wallbox."""
+        if self.wallbox.lifecycle.closed:
+            return
+        self._remove_save_listener()
+        self.wallbox.remove_callback(self._handle_push)
+        await super().async_shutdown()
+        if self._store is not None and self.wallbox.get_data() is not None:
+            # replaces a delayed write that is still pending
+            await self._store.async_save(self._data_to_save())
+        await self.wallbox.async_close()
+
+    @callback
+    def _schedule_save(self) -> None:
+        # only live data, written in batches by the store
+        if self._store is None or not self.wallbox.available or not self.changed:
+            return
+        self._store.async_delay_save(self._data_to_save, STORE_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict:
+        return {
+            "data": self.wallbox.get_data(),
+            "timestamp": self.wallbox._dps_data_timestamp,
+        }
+
+    async def _async_update_data(self):
+        await self.wallbox.async_update()
+        self._follow_poll_rate()
+        if not self.wallbox.available:
+            raise UpdateFailed(self.wallbox.status["message"])
+        return self.wallbox.get_data()
+
+    @property
+    def changed(self) -> frozenset:
+        """Names of the wallbox values that changed with the last update."""
+        return self.wallbox.changed_dps
+
+    @callback
+    def _follow_poll_rate(self) -> None:
+        interval = timedelta(seconds=self.wallbox.poll_interval)
+        if interval != self.update_interval:
+            _LOGGER.debug(f"{self.wallbox.ip}: poll interval now {interval}")
+            self.update_interval = interval
+
+    @callback
+    def _handle_push(self) -> None:
+        # not async_set_updated_data: it reschedules the next poll, so a
+        # wallbox pushing faster than that would never get a consistency read
+        self._follow_poll_rate()
+        self.data = self.wallbox.get_data()
+        self.async_update_listeners()
@@ -0,0 +1,40 @@
+"""Diagnostics support for the GEN2 Wallbox integration."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+TO_REDACT = {"localkey"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    wallbox = coordinator.wallbox
+    snapshot = wallbox.snapshot
+
+    return {
+        "entry": async_redact_data(entry.data, TO_REDACT),
+        "config": wallbox.config,
+        "status": wallbox.status,
+        "available": wallbox.is_available(),
+        "session": wallbox.connection_state.value,
+        "host": wallbox.host,
+        "poll_interval": wallbox.poll_interval,
+        "data_age": wallbox.data_age,
+        "dps": wallbox._dps_data,
+        "snapshot": None
+        if snapshot is None
+        else {name: getattr(snapshot, name) for name in snapshot.__slots__},
+        "metrics": wallbox.metrics.as_dict(),
+        "energy": wallbox.energy.as_dict(),
+        "breaker": wallbox.breaker.as_dict(),
+    }
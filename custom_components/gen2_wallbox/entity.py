@@ -0,0 +1,67 @@
+"""Base entity for the GEN2 Wallbox integration."""
+
+from __future__ import annotations
+
+import time
+
+from homeassistant.core import callback
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .coordinator import GEN2WallboxCoordinator
+
+
+class GEN2WallboxEntity(CoordinatorEntity[GEN2WallboxCoordinator]):
+    """Common parts of all wallbox entities."""
+
+    _attr_has_entity_name = True
+    _attr_nonunique_id: str
+    # wallbox values the state is derived from, None means any update
+    _source_dps: tuple[str, ...] | None = None
+    _last_state_write = 0.0
+
+    def __init__(self, coordinator: GEN2WallboxCoordinator) -> None:
+        super().__init__(coordinator)
+        self.device = coordinator.wallbox
+
+    @property
+    def unique_id(self) -> str | None:
+        return f"{self.device.ip}-{self._attr_nonunique_id}"
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return self.device.device_info
+
+    @property
+    def available(self) -> bool | None:
+        return self.device.is_available()
+
+    @property
+    def extra_state_attributes(self):
+        attributes = super().extra_state_attributes
+        if self.device.stale:
+            # restored from disk, the device has not confirmed it yet
+            return {**(attributes or {}), "stale": True}
+        return attributes
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._update_from_device()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        now = time.monotonic()
+        if (
+            self._source_dps is not None
+            and self.coordinator.changed.isdisjoint(self._source_dps)
+            and now - self._last_state_write < self.coordinator.state_heartbeat
+        ):
+            return
+        self._last_state_write = now
+        self._update_from_device()
+        super()._handle_coordinator_update()
+
+    @callback
+    def _update_from_device(self) -> None:
+        """Refresh the entity attributes from the wallbox cache."""
@@ -0,0 +1,60 @@
+"""Sharing one current budget between several wallboxes."""
+
+from __future__ import annotations
+
+import math
+from typing import NamedTuple
+
+
+class Demand(NamedTuple):
+    """One charging wallbox: cost is budget units per amp of its setpoint."""
+
+    key: str
+    cost: float
+    weight: float
+    min_current: int
+    max_current: int
+
+
+def allocate(budget: float, demands: list[Demand]) -> dict[str, int]:
+    """Weighted water-filling of budget into whole-amp setpoints.
+
+    Every wallbox gets weight x level amps, clamped to its range, with the
+    level chosen so the costs fill the budget. The level is found in one
+    sweep over the sorted range ends, O(n log n). Amps lost to rounding
+    down go to the largest remainders. When even the minimal currents do
+    not fit, everybody gets the minimum.
+    """
+    if not demands:
+        return {}
+    total = sum(d.cost * d.min_current for d in demands)
+    if total >= budget:
+        return {d.key: d.min_current for d in demands}
+    if sum(d.cost * d.max_current for d in demands) <= budget:
+        return {d.key: d.max_current for d in demands}
+
+    # (level, slope change) where a wallbox leaves its minimum or hits its maximum
+    events = sorted(
+        [(d.min_current / d.weight, d.cost * d.weight) for d in demands]
+        + [(d.max_current / d.weight, -d.cost * d.weight) for d in demands]
+    )
+    level = slope = 0.0
+    for at, change in events:
+        reached = total + slope * (at - level)
+        if reached >= budget:
+            break
+        total, level = reached, at
+        slope += change
+    level += (budget - total) / slope
+
+    exact = {
+        d.key: min(d.max_current, max(d.min_current, level * d.weight))
+        for d in demands
+    }
+    setpoints = {key: math.floor(value + 1e-9) for key, value in exact.items()}
+    left = budget - sum(d.cost * setpoints[d.key] for d in demands)
+    for d in sorted(demands, key=lambda d: setpoints[d.key] - exact[d.key]):
+        if d.cost <= left and setpoints[d.key] < d.max_current:
+            setpoints[d.key] += 1
+            left -= d.cost
+    return setpoints
@@ -0,0 +1,88 @@
+"""Circuit breaker for wallboxes that stopped answering."""
+
+from __future__ import annotations
+
+from enum import Enum
+import time
+
+# consecutive failures that open the breaker
+FAILURE_THRESHOLD = 3
+# wait before the first probe, doubled after every failed probe
+PROBE_BACKOFF_MIN = 30
+PROBE_BACKOFF_MAX = 600
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stops talking to a device that keeps failing.
+
+    After threshold consecutive failures the breaker opens and calls are
+    refused at once. When the backoff has passed a single call is let
+    through as a probe; its success closes the breaker, its failure opens
+    it again for twice as long.
+    """
+
+    def __init__(
+        self,
+        threshold: int = FAILURE_THRESHOLD,
+        backoff_min: float = PROBE_BACKOFF_MIN,
+        backoff_max: float = PROBE_BACKOFF_MAX,
+    ) -> None:
+        self.threshold = threshold
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self.backoff = backoff_min
+        self._retry_at = 0.0
+
+    @property
+    def closed(self) -> bool:
+        return self.state == BreakerState.CLOSED
+
+    def retry_in(self, now: float | None = None) -> float:
+        """Seconds until the next probe is let through."""
+        now = time.monotonic() if now is None else now
+        return max(0.0, self._retry_at - now) if not self.closed else 0.0
+
+    def allow(self, now: float | None = None) -> bool:
+        """Whether a call may go to the device now."""
+        now = time.monotonic() if now is None else now
+        if self.state == BreakerState.CLOSED:
+            return True
+        if self.state == BreakerState.OPEN and now >= self._retry_at:
+            self.state = BreakerState.HALF_OPEN
+            return True
+        self.rejected += 1
+        return False
+
+    def success(self) -> None:
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+        self.backoff = self.backoff_min
+
+    def failure(self, now: float | None = None) -> bool:
+        """Record a failed call, returns True when the breaker is open now."""
+        now = time.monotonic() if now is None else now
+        self.failures += 1
+        if self.state == BreakerState.HALF_OPEN:
+            self.backoff = min(self.backoff_max, self.backoff * 2)
+        elif self.state == BreakerState.OPEN or self.failures < self.threshold:
+            return self.state == BreakerState.OPEN
+        self.state = BreakerState.OPEN
+        self._retry_at = now + self.backoff
+        return True
+
+    def as_dict(self) -> dict:
+        return {
+            "state": self.state.value,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "retry_in": round(self.retry_in(), 1),
+        }
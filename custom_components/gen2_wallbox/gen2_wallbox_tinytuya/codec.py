@@ -0,0 +1,215 @@
+"""Tuya 3.3 frame codec: framing, AES and the JSON bodies of the wallbox."""
+
+from __future__ import annotations
+
+import binascii
+import json
+import logging
+import struct
+import time
+from typing import NamedTuple
+
+_LOGGER = logging.getLogger(__name__)
+
+PREFIX = 0x000055AA
+SUFFIX = 0x0000AA55
+
+# Tuya command words used by the wallbox
+CONTROL = 7
+STATUS = 8
+HEART_BEAT = 9
+DP_QUERY = 10
+
+PROTOCOL_VERSION = b"3.3"
+PROTOCOL_33_HEADER = PROTOCOL_VERSION + 12 * b"\x00"
+
+HEADER_FMT = ">4I"
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+FOOTER_FMT = ">2I"
+FOOTER_SIZE = struct.calcsize(FOOTER_FMT)
+# the replies of the wallbox stay well below 1 KB, a larger length field is
+# a stray prefix in the stream
+MAX_FRAME_LENGTH = 4096
+
+_HEADER = struct.Struct(HEADER_FMT)
+_FOOTER = struct.Struct(FOOTER_FMT)
+_RETCODE = struct.Struct(">I")
+_PREFIX_BYTES = _RETCODE.pack(PREFIX)
+
+# commands whose payload carries the "3.3" version header
+_VERSIONED_COMMANDS = (CONTROL,)
+
+
+class TuyaError(Exception):
+    """Error talking to a Tuya device."""
+
+
+class TuyaMessage(NamedTuple):
+    """One decoded frame."""
+
+    seqno: int
+    cmd: int
+    retcode: int | None
+    payload: bytes
+
+
+def import_cipher() -> None:
+    """Import the AES backend ahead, it is slow and blocking."""
+    import cryptography.hazmat.primitives.ciphers  # noqa: F401
+
+
+class TuyaCipher:
+    """AES-128-ECB with PKCS7 padding keyed by the device local key."""
+
+    def __init__(self, localkey: str) -> None:
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+        self._cipher = Cipher(algorithms.AES(localkey.encode("latin1")), modes.ECB())
+
+    def encrypt(self, raw: bytes) -> bytes:
+        pad = 16 - len(raw) % 16
+        encryptor = self._cipher.encryptor()
+        return encryptor.update(raw + bytes([pad]) * pad) + encryptor.finalize()
+
+    def decrypt(self, enc: bytes) -> bytes:
+        decryptor = self._cipher.decryptor()
+        raw = decryptor.update(enc) + decryptor.finalize()
+        pad = raw[-1] if raw else 0
+        if not 0 < pad <= 16:
+            raise TuyaError("invalid padding, wrong local key?")
+        return raw[:-pad]
+
+
+def pack_message(seqno: int, cmd: int, payload: bytes) -> bytes:
+    """Frame a payload: header, payload, crc32 and suffix."""
+    header = _HEADER.pack(PREFIX, seqno, cmd, len(payload) + FOOTER_SIZE)
+    crc = binascii.crc32(payload, binascii.crc32(header)) & 0xFFFFFFFF
+    return b"".join((header, payload, _FOOTER.pack(crc, SUFFIX)))
+
+
+def _unpack_at(view: memoryview, offset: int) -> tuple[TuyaMessage, int]:
+    """Parse the frame starting at offset of view, return it and its end.
+
+    Header, crc and return code are read in place; the payload is the only
+    copy made.
+    """
+    prefix, seqno, cmd, length = _HEADER.unpack_from(view, offset)
+    if prefix != PREFIX:
+        raise TuyaError(f"invalid prefix {prefix:#x}")
+    end = offset + HEADER_SIZE + length
+    if not FOOTER_SIZE <= length <= MAX_FRAME_LENGTH or end > len(view):
+        raise TuyaError(f"invalid length {length}")
+    body_end = end - FOOTER_SIZE
+    crc, suffix = _FOOTER.unpack_from(view, body_end)
+    if suffix != SUFFIX:
+        raise TuyaError(f"invalid suffix {suffix:#x}")
+    if crc != binascii.crc32(view[offset:body_end]) & 0xFFFFFFFF:
+        raise TuyaError("crc mismatch")
+
+    start = offset + HEADER_SIZE
+    retcode = None
+    # device frames start with a 32 bit return code, except some pushes
+    if body_end - start >= 4 and not view[start] | view[start + 1] | view[start + 2]:
+        retcode = _RETCODE.unpack_from(view, start)[0]
+        start += 4
+    return TuyaMessage(seqno, cmd, retcode, view[start:body_end].tobytes()), end
+
+
+def unpack_message(data: bytes) -> TuyaMessage:
+    """Parse one complete frame, checking prefix, suffix and crc."""
+    with memoryview(data) as view:
+        return _unpack_at(view, 0)[0]
+
+
+def unpack_frames(buffer: bytearray) -> list[TuyaMessage]:
+    """Remove every complete frame from the start of buffer and parse it.
+
+    Garbage before a frame and frames failing their checks are dropped. A
+    length field out of range is taken for a stray prefix: the search goes
+    on right after it instead of waiting for a frame that never comes.
+    """
+    messages = []
+    offset = 0
+    with memoryview(buffer) as view:
+        while len(buffer) - offset >= HEADER_SIZE:
+            start = buffer.find(_PREFIX_BYTES, offset)
+            if start < 0:
+                offset = max(offset, len(buffer) - 3)
+                break
+            offset = start
+            if len(buffer) - offset < HEADER_SIZE:
+                break
+            length = _RETCODE.unpack_from(view, offset + 12)[0]
+            if not FOOTER_SIZE <= length <= MAX_FRAME_LENGTH:
+                _LOGGER.debug(f"Dropping prefix with length {length}")
+                offset += len(_PREFIX_BYTES)
+                continue
+            if len(buffer) - offset < HEADER_SIZE + length:
+                break
+            try:
+                message, offset = _unpack_at(view, offset)
+            except TuyaError as e:
+                _LOGGER.debug(f"Dropping frame: {e}")
+                offset += HEADER_SIZE + length
+                continue
+            messages.append(message)
+    del buffer[:offset]
+    return messages
+
+
+class FrameCodec:
+    """Request bodies and reply decoding of one device.
+
+    The AES cipher of the local key is built once, on first use.
+    """
+
+    def __init__(self, deviceid: str, localkey: str) -> None:
+        self.deviceid = deviceid
+        self._localkey = localkey
+        self._cipher = None
+
+    @property
+    def cipher(self) -> TuyaCipher:
+        if self._cipher is None:
+            self._cipher = TuyaCipher(self._localkey)
+        return self._cipher
+
+    def payload(self, cmd: int, dps: dict | None = None) -> bytes:
+        """Encrypted request body of cmd."""
+        now = str(int(time.time()))
+        if cmd == CONTROL:
+            body = {"devId": self.deviceid, "uid": self.deviceid, "t": now, "dps": dps}
+        elif cmd == HEART_BEAT:
+            body = {"gwId": self.deviceid, "devId": self.deviceid}
+        else:
+            body = {
+                "gwId": self.deviceid,
+                "devId": self.deviceid,
+                "uid": self.deviceid,
+                "t": now,
+            }
+        raw = json.dumps(body, separators=(",", ":")).encode()
+        enc = self.cipher.encrypt(raw)
+        if cmd in _VERSIONED_COMMANDS:
+            return PROTOCOL_33_HEADER + enc
+        return enc
+
+    def encode(self, seqno: int, cmd: int, dps: dict | None = None) -> bytes:
+        """Complete request frame."""
+        return pack_message(seqno, cmd, self.payload(cmd, dps))
+
+    def decode_payload(self, payload: bytes) -> dict | None:
+        """Decrypt and parse the JSON body of a device frame."""
+        start = len(PROTOCOL_33_HEADER) if payload.startswith(PROTOCOL_VERSION) else 0
+        if start >= len(payload):
+            return None
+        with memoryview(payload) as view:
+            body = view[start:]
+            if len(body) % 16 == 0:
+                raw = self.cipher.decrypt(body)
+            else:
+                raw = body.tobytes()
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            raise TuyaError(f"undecodable payload: {raw[:32]!r}") from e
@@ -0,0 +1,29 @@
+"""Steps of a timed command sequence sent over one device session."""
+
+from __future__ import annotations
+
+from typing import Any, NamedTuple
+
+
+class Write(NamedTuple):
+    """Write all values in one CONTROL frame."""
+
+    values: dict
+
+
+class Delay(NamedTuple):
+    """Wait until this long after the previous write was acknowledged."""
+
+    seconds: float
+
+
+class Verify(NamedTuple):
+    """Wait until the device reports all values, fail after timeout."""
+
+    values: dict
+    timeout: float = 5
+
+
+def pulse(key: Any, width: float = 1.0, on: Any = True, off: Any = False) -> list:
+    """Set key to on for width seconds, then back to off."""
+    return [Write({key: on}), Delay(width), Write({key: off})]
@@ -0,0 +1,118 @@
+"""Tuya LAN beacons, to follow wallboxes whose address changed."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import struct
+import time
+
+from .codec import TuyaCipher, TuyaError, unpack_message
+
+_LOGGER = logging.getLogger(__name__)
+
+# 6666 carries plain beacons, 6667 the encrypted ones of 3.3 devices
+UDP_PORTS = (6666, 6667)
+UDP_KEY = hashlib.md5(b"yGAdlopoPVldABfn").digest()
+# devices broadcast every few seconds while no client is connected
+DISCOVERY_TTL = 300
+
+
+def decode_beacon(data: bytes, cipher: TuyaCipher) -> dict:
+    """Return the JSON body of one beacon frame."""
+    payload = unpack_message(data).payload
+    if not payload.startswith(b"{"):
+        payload = cipher.decrypt(payload)
+    try:
+        return json.loads(payload)
+    except ValueError as e:
+        raise TuyaError(f"undecodable beacon: {payload[:32]!r}") from e
+
+
+class DiscoveryListener:
+    """One UDP listener mapping device ids to their current address.
+
+    Addresses are cached for ttl seconds after the last beacon, the address
+    is the one the beacon came from. Subscribers are called with the new
+    address when their device shows up elsewhere.
+    """
+
+    def __init__(self, ttl: float = DISCOVERY_TTL, ports=UDP_PORTS) -> None:
+        self.ttl = ttl
+        self.ports = ports
+        self.beacons = 0
+        self._cipher = TuyaCipher(UDP_KEY.decode("latin1"))
+        self._cache: dict[str, tuple[str, float]] = {}
+        self._subscribers: dict[str, set] = {}
+        self._transports = []
+
+    async def async_start(self) -> None:
+        """Bind the beacon ports; a port in use only disables that port."""
+        loop = asyncio.get_running_loop()
+        for port in self.ports:
+            try:
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _BeaconProtocol(self),
+                    local_addr=("0.0.0.0", port),
+                    reuse_port=True,
+                    allow_broadcast=True,
+                )
+            except (OSError, ValueError) as e:
+                _LOGGER.warning(f"Cannot listen for Tuya beacons on {port}: {e}")
+                continue
+            self._transports.append(transport)
+
+    def close(self) -> None:
+        for transport in self._transports:
+            transport.close()
+        self._transports.clear()
+
+    def lookup(self, deviceid: str) -> str | None:
+        """Last address seen for deviceid, None when unknown or expired."""
+        if deviceid not in self._cache:
+            return None
+        host, expires = self._cache[deviceid]
+        if time.monotonic() >= expires:
+            del self._cache[deviceid]
+            return None
+        return host
+
+    def subscribe(self, deviceid: str, callback):
+        """Call callback(host) on address changes; returns the unsubscribe."""
+        self._subscribers.setdefault(deviceid, set()).add(callback)
+
+        def remove() -> None:
+            self._subscribers.get(deviceid, set()).discard(callback)
+
+        return remove
+
+    def handle_beacon(self, data: bytes, addr) -> None:
+        try:
+            beacon = decode_beacon(data, self._cipher)
+        except (TuyaError, ValueError, struct.error) as e:
+            _LOGGER.debug(f"{addr[0]}: ignoring beacon: {e}")
+            return
+        deviceid = beacon.get("gwId")
+        if not deviceid:
+            return
+        self.beacons += 1
+        # the sender, not the unauthenticated "ip" the beacon claims
+        host = addr[0]
+        if beacon.get("ip", host) != host:
+            _LOGGER.debug(f"{deviceid}: beacon from {host} claims {beacon['ip']}")
+        previous = self.lookup(deviceid)
+        self._cache[deviceid] = (host, time.monotonic() + self.ttl)
+        if host != previous:
+            _LOGGER.debug(f"{deviceid}: announced at {host}")
+            for callback in tuple(self._subscribers.get(deviceid, ())):
+                callback(host)
+
+
+class _BeaconProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener: DiscoveryListener) -> None:
+        self.listener = listener
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.listener.handle_beacon(data, addr)
@@ -0,0 +1,105 @@
+"""Energy charged, integrated from the power samples of the wallbox."""
+
+from __future__ import annotations
+
+from collections import deque
+
+from .snapshot import WallboxSnapshot
+
+# used when the wallbox does not report its input voltage
+NOMINAL_VOLTAGE = 230
+# samples further apart are not integrated, the kWh counter bridges them
+MAX_GAP = 150
+SAMPLE_BUFFER = 360
+
+
+def estimated_power(snapshot: WallboxSnapshot, phases: int) -> float | None:
+    """Power in W from the measured voltage and current of each phase."""
+    if snapshot.current is None:
+        return None
+    voltage = snapshot.voltage or NOMINAL_VOLTAGE
+    return voltage * snapshot.current * phases
+
+
+def sample_power(snapshot: WallboxSnapshot, phases: int) -> float | None:
+    """Power in W, falling back to the DeviceKw report without a current."""
+    power = estimated_power(snapshot, phases)
+    if power is None and snapshot.kw is not None:
+        return snapshot.kw * 1000
+    return power
+
+
+class EnergyMeter:
+    """Trapezoidal integration of (timestamp, W) samples into Wh.
+
+    Every sample costs constant time: only the last one of the ring buffer
+    is needed. Over a gap longer than max_gap the power is unknown, the
+    device kWh counter is used instead; a counter going down is a reset and
+    adds nothing. session restarts with every charging session.
+    """
+
+    def __init__(self, max_gap: float = MAX_GAP, size: int = SAMPLE_BUFFER) -> None:
+        self.max_gap = max_gap
+        self.samples: deque[tuple[float, float]] = deque(maxlen=size)
+        self.total = 0.0
+        self.session = 0.0
+        self.gaps = 0
+        self.counter_resets = 0
+        self._counter = None
+        self._charging = None
+
+    def add(
+        self,
+        timestamp: float,
+        watts: float,
+        counter: float | None = None,
+        charging: bool = False,
+    ) -> float:
+        """Integrate up to a new sample, return the Wh added."""
+        if self.samples and timestamp < self.samples[-1][0]:
+            # late report, older than what is integrated already
+            return 0.0
+        if charging and self._charging is False:
+            self.session = 0.0
+        self._charging = charging
+
+        energy = 0.0
+        gap = False
+        if self.samples:
+            last_timestamp, last_watts = self.samples[-1]
+            elapsed = timestamp - last_timestamp
+            if elapsed <= self.max_gap:
+                energy = (last_watts + watts) / 2 * elapsed / 3600
+            else:
+                gap = True
+                self.gaps += 1
+        if counter is not None:
+            if self._counter is not None and counter < self._counter:
+                self.counter_resets += 1
+            elif gap and self._counter is not None:
+                energy = (counter - self._counter) * 1000
+            self._counter = counter
+
+        self.samples.append((timestamp, watts))
+        self.total += energy
+        self.session += energy
+        return energy
+
+    def restore(self, total: float, session: float = 0.0) -> None:
+        """Continue from totals saved before a restart."""
+        self.total += total
+        self.session += session
+
+    @property
+    def power(self) -> float | None:
+        """Last sampled power in W."""
+        return self.samples[-1][1] if self.samples else None
+
+    def as_dict(self) -> dict:
+        return {
+            "total_wh": round(self.total, 1),
+            "session_wh": round(self.session, 1),
+            "samples": len(self.samples),
+            "gaps": self.gaps,
+            "counter_resets": self.counter_resets,
+        }
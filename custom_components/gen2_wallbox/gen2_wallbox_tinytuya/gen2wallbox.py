@@ -1,28 +1,32 @@
 import time
 import logging
 
-import tinytuya
-
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-
-import nest_asyncio
 
-nest_asyncio.apply()
+from .breaker import CircuitBreaker
+from .commands import Write, Verify, pulse
+from .energy import EnergyMeter, sample_power
+from .lifecycle import Lifecycle
+from .poll_rate import AdaptivePollInterval
+from .protocol import ConnectionState, TuyaClient, TuyaError
+from .recording import FLUSH_INTERVAL, TrafficRecorder
+from .snapshot import WallboxSnapshot
+from .writer import CoalescingWriter
 
 _LOGGER = logging.getLogger(__name__)
 # logging.basicConfig(level=logging.DEBUG)
 
-_executor = ThreadPoolExecutor(1)
-
-# tinytuya.set_debug(True)
-# Connect to Device
-
 
 class GEN2_Wallbox:
-    """CLASS represoenting GEN2 WALLBOX using tinytuya local integrations."""
+    """CLASS represoenting GEN2 WALLBOX using the local Tuya 3.3 protocol."""
 
     UPDATE_INTERVAL = 5
+    # how long SwipeRfid is held to start/stop a session
+    SWIPE_PULSE = 1.0
+    # full status read while pushed reports keep the cache fresh
+    CONSISTENCY_INTERVAL = 60
+    # how long a requested value is shown before the device confirms it
+    OPTIMISTIC_TIMEOUT = 15
     MAX_CURRENT = 16
     MIN_CURRENT = 8
 
@@ -32,6 +36,9 @@ class GEN2_Wallbox:
     # last cached data
     _dps_data = None
     _dps_data_timestamp = 0
+    # decoded view of _dps_data
+    snapshot: WallboxSnapshot | None = None
+    _snapshot_seq = 0
 
     _dps_codes = {
         "DeviceState": 101,
@@ -44,7 +51,7 @@ class GEN2_Wallbox:
         "Set32A": 111,
     }
 
-    def __init__(self, deviceid, ip, localkey) -> None:
+    def __init__(self, deviceid, ip, localkey, device=None) -> None:
         self.name = "GEN2"
         self.deviceid = deviceid
         self.ip = ip
@@ -54,108 +61,395 @@ class GEN2_Wallbox:
 
         self.data = {}
         self.available = False
+        # serving data restored from disk, not yet confirmed by the device
+        self.stale = False
+        self.consistency_interval = self.CONSISTENCY_INTERVAL
+        self._last_full_fetch = 0
+        self._callbacks = set()
+        # shared PollScheduler when several wallboxes are polled together
+        self.scheduler = None
+        self.poll_rate = AdaptivePollInterval()
+        self.writer = CoalescingWriter(self.async_set_values)
+        # upper bound of the setpoint given by a site load balancer
+        self.current_limit = None
+        self._optimistic = {}
+        # names of the values that changed with the last update
+        self.changed_dps = frozenset()
+        self.energy = EnergyMeter()
+        self._published_dps = {}
+        self._published_available = (False, False)
+
+        # a ReplayClient plays a recording back instead of the device
+        self.device = device or TuyaClient(
+            deviceid, ip, localkey, timeout=3, retries=5
+        )
+        # a wallbox switched off at its breaker costs nothing but probes
+        self.breaker = CircuitBreaker()
+        # closes the session after the queued writes are dropped
+        self._flush_task = None
+        self.lifecycle = Lifecycle()
+        self.lifecycle.on_close(self.device.async_close)
+        self.lifecycle.on_close(self.writer.async_cancel)
+        self.device.add_listener(self._handle_push)
+        self.metrics = self.device.metrics
 
-        self.device = tinytuya.OutletDevice(deviceid, ip, localkey)
-        self.device.set_version(3.3)
-        self.device.set_socketTimeout(3)
-        self.device.set_socketRetryLimit(5)
+    def is_available(self) -> bool:
+        return self.available or self.stale
+
+    def restore(self, data, timestamp) -> None:
+        """Serve a previously saved status until the device is read."""
+        if self._dps_data is not None:
+            return
+        self._dps_data = data
+        self._dps_data_timestamp = timestamp
+        self.stale = True
+        self._decode()
+        self._track_changes()
+
+    @property
+    def connection_state(self) -> ConnectionState:
+        """State of the persistent session to the device."""
+        return self.device.state
+
+    async def async_close(self):
+        """Cancel the running polls and commands and close the session."""
+        self._callbacks.clear()
+        await self.lifecycle.async_close()
+
+    async def async_start_recording(self, path: str) -> None:
+        """Append the traffic with the device to the JSON lines file at path."""
+        if self.device.recorder is not None:
+            return
+        loop = asyncio.get_running_loop()
+        recorder = await loop.run_in_executor(
+            None, TrafficRecorder.open, path, self.deviceid
+        )
+        self.device.recorder = recorder
+        self._flush_task = loop.create_task(self._async_flush_recording(recorder))
+        self.lifecycle.on_close(self.async_stop_recording)
+        _LOGGER.info(f"{self.ip}: recording traffic to {path}")
+
+    async def async_stop_recording(self) -> None:
+        recorder, self.device.recorder = self.device.recorder, None
+        if recorder is None:
+            return
+        self._flush_task.cancel()
+        try:
+            await self._flush_task
+        except asyncio.CancelledError:
+            pass
+        await recorder.async_close()
+
+    async def _async_flush_recording(self, recorder: TrafficRecorder) -> None:
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await recorder.async_flush()
+            except OSError as e:
+                _LOGGER.warning(f"{self.ip}: writing the traffic log failed: {e}")
+
+    @property
+    def host(self) -> str:
+        """Current address of the device, ip stays its configured identity."""
+        return self.device.host
+
+    async def async_rebind(self, host: str) -> None:
+        """Follow the device to a new address."""
+        await self.device.async_rebind(host)
+
+    def register_callback(self, callback) -> None:
+        """Register callback, called when the device pushes new data."""
+        self._callbacks.add(callback)
+
+    def remove_callback(self, callback) -> None:
+        self._callbacks.discard(callback)
+
+    def _notify(self, changed=None) -> None:
+        """Tell listeners about new data; changed defaults to a diff of the cache."""
+        if changed is None:
+            self._track_changes()
+        else:
+            self.changed_dps = frozenset(changed)
+        for callback in tuple(self._callbacks):
+            callback()
+
+    def _track_changes(self) -> frozenset:
+        """Diff the cache against the last published snapshot."""
+        available = (self.is_available(), self.stale)
+        dps = self._dps_data["dps"] if available[0] and self._dps_data else {}
+        if available != self._published_available:
+            changed = frozenset(self._dps_codes)
+        else:
+            changed = frozenset(
+                parameter
+                for parameter, code in self._dps_codes.items()
+                if dps.get(str(code)) != self._published_dps.get(str(code))
+            )
+        self._published_dps = dict(dps)
+        self._published_available = available
+        self.changed_dps = changed
+        return changed
+
+    def _handle_push(self, data) -> None:
+        """Merge an unsolicited DPS report into the cache."""
+        _LOGGER.debug(f"Pushed {data}")
+        self.breaker.success()
+        self._merge_dps(data["dps"])
+
+    def _merge_dps(self, dps) -> bool:
+        """Merge a partial DPS report into the cache and notify listeners."""
+        if self._dps_data is None or self.stale:
+            # partial report, wait for the first full status
+            return False
+        self._dps_data["dps"].update(dps)
+        self._dps_data_timestamp = time.time()
+        self._decode()
+        self._confirm_optimistic()
+        self.available = True
+        self.poll_rate.observe(self.snapshot.state)
+        self._notify()
+        return True
+
+    def _decode(self) -> None:
+        """Decode the cached status once for all readers."""
+        self._snapshot_seq += 1
+        self.snapshot = WallboxSnapshot.from_dps(
+            self._dps_data["dps"], self._dps_data_timestamp, self._snapshot_seq
+        )
+        self._sample_energy(self._dps_data_timestamp)
 
-        self.update()
+    def _sample_energy(self, timestamp) -> None:
+        power = sample_power(self.snapshot, self.car_phases)
+        if power is not None:
+            self.energy.add(
+                timestamp, power, self.snapshot.kwh, self.snapshot.charging
+            )
 
-    def is_available(self) -> bool:
-        return self.available
+    @property
+    def poll_interval(self) -> float:
+        """Seconds until the next poll is due."""
+        return self.poll_rate.interval
 
     def get_data(self):
-        if self.available:
+        if self.is_available():
             return self._dps_data
         else:
             return None
 
     def get_value(self, parameter):
-        if self.available:
+        if self.is_available():
             return self._dps_data["dps"][f"{self._dps_codes[parameter]}"]
         else:
             return None
 
-    def fetch_status_from_device(self):
+    @property
+    def data_age(self) -> float | None:
+        """Seconds since the cached data was received."""
+        if self._dps_data is None:
+            return None
+        return time.time() - self._dps_data_timestamp
+
+    async def async_fetch_status_from_device(self):
+        if not self.breaker.allow():
+            retry_in = self.breaker.retry_in()
+            self.status = {
+                "connected": False,
+                "message": f"not answering, next try in {retry_in:.0f} s",
+                "session": self.connection_state.value,
+            }
+            self.available = False
+            self.poll_rate.failed()
+            self._track_changes()
+            return "open"
+
+        started = time.monotonic()
         try:
-            data = self.device.status()
-            if "Error" in data:
-                self.status = {"connected": False, "message": data["Error"]}
-                self.available = False
-            else:
-                self.status = {"connected": True, "message": ""}
-                self.available = True
-
-            _LOGGER.debug(self.available)
+            # one attempt only while probing a wallbox that did not answer
+            data = await self.device.async_status(
+                attempts=None if self.breaker.closed else 1
+            )
+            self.metrics.record_poll(time.monotonic() - started)
+            self.breaker.success()
+            self.status = {
+                "connected": True,
+                "message": "",
+                "session": self.connection_state.value,
+            }
+            self.available = True
+            self.stale = False
             _LOGGER.debug(data)
-            if self.available:
-                self._dps_data = data
-                self._dps_data_timestamp = time.time()
+            self._dps_data = data
+            self._dps_data_timestamp = self._last_full_fetch = time.time()
+            self._decode()
+            self._confirm_optimistic()
+            self.poll_rate.observe(self.snapshot.state)
 
         except Exception as e:
-            self.status = {"connected": False, "message": str(e)}
+            self.metrics.record_poll(time.monotonic() - started, e)
+            self.status = {
+                "connected": False,
+                "message": str(e),
+                "session": self.connection_state.value,
+            }
             self.available = False
+            self.poll_rate.failed()
+            if self.breaker.failure():
+                backoff = self.breaker.backoff
+                _LOGGER.debug(f"{self.ip}: not answering, probe in {backoff} s")
+                # no reconnect attempts until the next probe
+                await self.device.async_disconnect()
+        _LOGGER.debug(self.available)
+        self._track_changes()
         return "ok"
 
-    async def async_update(self):
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(_executor, self.fetch_status_from_device)
-
-    def update(self, ts=None):
-        loop = asyncio.new_event_loop()
-        loop.run_until_complete(self.async_update())
-        loop.close()
-
-    ### set value
-    def set_value(self, parameter, value):
-        loop = asyncio.new_event_loop()
-        loop.run_until_complete(self.async_set_value(parameter, value))
-        loop.close()
-
+    async def async_update(self, ts=None):
+        """update status of the device"""
+        if (
+            self.device.connected
+            and self.available
+            and time.time() - self._last_full_fetch < self.consistency_interval
+        ):
+            # the open session delivers changes as they happen, so the
+            # power is still the last one reported
+            self.changed_dps = frozenset()
+            self._sample_energy(time.time())
+            return "pushed"
+        if self.scheduler is not None:
+            return await self.scheduler.async_run(
+                self.deviceid, self._async_fetch_tracked
+            )
+        return await self._async_fetch_tracked()
+
+    async def _async_fetch_tracked(self):
+        with self.lifecycle.track():
+            return await self.async_fetch_status_from_device()
+
+    def get_target(self, parameter):
+        """Requested value not yet confirmed by the device, else the device value."""
+        if parameter in self._optimistic:
+            value, deadline = self._optimistic[parameter]
+            if time.time() < deadline:
+                return value
+            del self._optimistic[parameter]
+        return self.get_value(parameter)
+
+    @property
+    def target_current(self) -> int | None:
+        """Requested charging current, or the device setpoint."""
+        if "Set32A" in self._optimistic:
+            value, deadline = self._optimistic["Set32A"]
+            if time.time() < deadline:
+                return value
+        return self.snapshot.setpoint if self.snapshot is not None else None
+
+    def _confirm_optimistic(self) -> None:
+        for parameter, (value, _) in list(self._optimistic.items()):
+            if self.get_value(parameter) == value:
+                del self._optimistic[parameter]
+
+    # set value
     async def async_set_value(self, parameter, value):
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(
-            _executor, lambda: self.send_value_to_device(parameter, value)
-        )
-
-    def send_value_to_device(self, parameter, value):
-        res = self.device.set_value(self._dps_codes[parameter], value)
-        _LOGGER.debug(f"Setting {parameter} to {value} - {res}")
+        return await self.async_set_values({parameter: value})
+
+    async def async_set_values(self, values: dict):
+        """Write several values in one frame.
+
+        The cache is refreshed from the DPS the device echoes back; only when
+        no echo arrives is the status read again.
+        """
+        self._check_breaker()
+        res = await self.device.async_set_dps(self._codes(values))
+        _LOGGER.debug(f"Setting {values} - {res}")
+        if res is None or not self._merge_dps(res["dps"]):
+            await self.async_fetch_status_from_device()
+            self._notify(self.changed_dps)
         return res
 
-    def start_charging(self):
-        loop = asyncio.new_event_loop()
-        loop.run_until_complete(self.async_start_charging())
-        loop.close()
+    def request_value(self, parameter, value):
+        """Queue a write, collapsing it with pending writes of the same value.
+
+        The value is reported by get_target right away. Returns a future
+        resolved once the value has been sent. Set32A is clamped to the
+        share of a site load balancer.
+        """
+        if parameter == "Set32A" and self.current_limit is not None:
+            value = min(value, self.current_limit)
+        self._optimistic[parameter] = (value, time.time() + self.OPTIMISTIC_TIMEOUT)
+        future = self.writer.submit(parameter, value)
+        future.add_done_callback(
+            lambda f: f.cancelled()
+            or f.exception() is None
+            or self._drop_optimistic(parameter, value)
+        )
+        self._notify({parameter})
+        return future
+
+    def _drop_optimistic(self, parameter, value) -> None:
+        if self._optimistic.get(parameter, (None,))[0] == value:
+            del self._optimistic[parameter]
+            self._notify({parameter})
+
+    async def async_run_commands(self, steps):
+        """Run a Write/Delay/Verify sequence over one session with exact timing.
+
+        Values are keyed by parameter name, see _dps_codes. The DPS the device
+        reported meanwhile are merged into the cache.
+        """
+        self._check_breaker()
+        device_steps = [
+            step._replace(values=self._codes(step.values))
+            if isinstance(step, (Write, Verify))
+            else step
+            for step in steps
+        ]
+        with self.lifecycle.track():
+            reported = await self.device.async_run_sequence(device_steps)
+        _LOGGER.debug(f"Sequence {steps} - {reported}")
+        if reported:
+            self._merge_dps(reported)
+        return reported
+
+    def _check_breaker(self) -> None:
+        if not self.breaker.closed:
+            raise TuyaError(f"{self.ip}: not answering, command not sent")
+
+    def _codes(self, values: dict) -> dict:
+        return {self._dps_codes[parameter]: value for parameter, value in values.items()}
+
+    def is_charging(self) -> bool:
+        return (
+            self.is_available()
+            and self.snapshot is not None
+            and self.snapshot.charging
+        )
 
     async def async_start_charging(self):
-        await self.async_set_value("SwipeRfid", True)
-        asyncio.sleep(1)
-        await self.async_set_value("SwipeRfid", False)
-
-    def stop_charging(self):
-        loop = asyncio.new_event_loop()
-        loop.run_until_complete(self.async_stop_charging())
-        loop.close()
+        if not self.is_charging():
+            await self.async_run_commands(pulse("SwipeRfid", self.SWIPE_PULSE))
 
     async def async_stop_charging(self):
-        await self.async_set_value("SwipeRfid", True)
-        asyncio.sleep(1)
-        await self.async_set_value("SwipeRfid", False)
+        if self.is_charging():
+            await self.async_run_commands(pulse("SwipeRfid", self.SWIPE_PULSE))
 
 
 if __name__ == "__main__":
-    DEVICE_ID = "bff43c83a43130ad07vf7v"
-    LOCAL_KEY = "b1d93795cba6663e"  #'00ed6c23d3eb8ee5'
-    IP_ADDRESS = "10.0.30.9"
+    import sys
+
+    if len(sys.argv) != 4:
+        sys.exit(f"usage: {sys.argv[0]} DEVICE_ID HOST LOCAL_KEY")
+    DEVICE_ID, HOST, LOCAL_KEY = sys.argv[1:]
+
+    async def main():
+        wb = GEN2_Wallbox(DEVICE_ID, HOST, LOCAL_KEY)
+        await wb.async_update()
+        print(wb._dps_data)
+        print(wb.status)
 
-    wb = GEN2_Wallbox(DEVICE_ID, IP_ADDRESS, LOCAL_KEY)
-    print(wb._dps_data)
-    print(wb.status)
+        print("Setting 32A to 8")
+        await wb.async_set_value("Set32A", 8)
 
-    print("Setting 32A to 16")
-    wb.set_value("Set32A", 8)
+        print("Stopping Charging")
+        await wb.async_stop_charging()
+        await wb.async_close()
 
-    print("Starting Charging")
-    wb.stop_charging()
+    asyncio.run(main())
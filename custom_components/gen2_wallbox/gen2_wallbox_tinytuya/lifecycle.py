@@ -0,0 +1,60 @@
+"""Everything one wallbox keeps running, stopped together."""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import contextmanager
+import inspect
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+# how long in-flight work may take to finish once cancelled
+CLOSE_TIMEOUT = 5
+
+
+class Lifecycle:
+    """Tracks the running polls and commands and the cleanup of a wallbox.
+
+    async_close cancels the tracked tasks, waits at most deadline seconds
+    for them and then runs the callbacks in reverse order of registration.
+    """
+
+    def __init__(self) -> None:
+        self.closed = False
+        self._tasks: set[asyncio.Task] = set()
+        self._callbacks = []
+
+    @contextmanager
+    def track(self):
+        """Track the running task while inside the block."""
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            yield
+        finally:
+            self._tasks.discard(task)
+
+    def on_close(self, callback) -> None:
+        """Call callback (plain or coroutine function) on close."""
+        self._callbacks.append(callback)
+
+    async def async_close(self, deadline: float = CLOSE_TIMEOUT) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        current = asyncio.current_task()
+        tasks = [task for task in self._tasks if task is not current]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=deadline)
+            if pending:
+                _LOGGER.warning(f"{len(pending)} tasks did not stop in {deadline} s")
+        while self._callbacks:
+            result = self._callbacks.pop()()
+            if inspect.isawaitable(result):
+                try:
+                    await asyncio.wait_for(result, deadline)
+                except asyncio.TimeoutError:
+                    _LOGGER.warning(f"Cleanup did not finish in {deadline} s")
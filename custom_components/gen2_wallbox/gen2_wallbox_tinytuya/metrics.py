@@ -0,0 +1,73 @@
+"""Protocol counters of one wallbox connection."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import Counter
+
+# upper bounds of the poll latency histogram in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class ProtocolMetrics:
+    """Cheap running counters, updated in place on every exchange."""
+
+    def __init__(self) -> None:
+        self.polls_ok = 0
+        self.polls_failed = 0
+        self.errors = Counter()
+        self.retries = 0
+        self.connects = 0
+        self.connect_failures = 0
+        self.reconnects = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.last_latency = None
+        self.latency_sum = 0.0
+        self._latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record_poll(self, latency: float, error: BaseException | None = None) -> None:
+        """Count one status poll and its outcome."""
+        if error is None:
+            self.polls_ok += 1
+            self.last_latency = latency
+            self.latency_sum += latency
+            self._latency_counts[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        else:
+            self.polls_failed += 1
+            self.errors[type(error.__cause__ or error).__name__] += 1
+
+    def record_connect(self, ok: bool) -> None:
+        if not ok:
+            self.connect_failures += 1
+            return
+        if self.connects:
+            self.reconnects += 1
+        self.connects += 1
+
+    @property
+    def mean_latency(self) -> float | None:
+        if not self.polls_ok:
+            return None
+        return self.latency_sum / self.polls_ok
+
+    def latency_histogram(self) -> dict[str, int]:
+        """Successful polls per latency bucket, keyed by upper bound."""
+        labels = [f"le_{bound:g}s" for bound in LATENCY_BUCKETS] + ["le_inf"]
+        return dict(zip(labels, self._latency_counts))
+
+    def as_dict(self) -> dict:
+        return {
+            "polls_ok": self.polls_ok,
+            "polls_failed": self.polls_failed,
+            "errors": dict(self.errors),
+            "retries": self.retries,
+            "connects": self.connects,
+            "connect_failures": self.connect_failures,
+            "reconnects": self.reconnects,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "last_latency": self.last_latency,
+            "mean_latency": self.mean_latency,
+            "latency_histogram": self.latency_histogram(),
+        }
@@ -0,0 +1,53 @@
+"""Per-wallbox poll interval that follows what the device is doing."""
+
+from __future__ import annotations
+
+import time
+
+ACTIVE_INTERVAL = 10
+IDLE_INTERVAL = 60
+MAX_BACKOFF_INTERVAL = 300
+# keep polling fast this long after the state changed
+TRANSITION_HOLD = 60
+
+# states of WallboxSnapshot while a car is drawing current
+ACTIVE_STATES = ("charging",)
+
+
+class AdaptivePollInterval:
+    """Fast while charging or changing state, slow when idle, backoff when offline."""
+
+    def __init__(
+        self,
+        active: float = ACTIVE_INTERVAL,
+        idle: float = IDLE_INTERVAL,
+        max_backoff: float = MAX_BACKOFF_INTERVAL,
+        transition_hold: float = TRANSITION_HOLD,
+    ) -> None:
+        self.active = active
+        self.idle = max(idle, active)
+        self.max_backoff = max(max_backoff, self.idle)
+        self.transition_hold = transition_hold
+        self.interval = active
+        self.failures = 0
+        self._state = None
+        self._changed_at = 0.0
+
+    def observe(self, state: str | None, now: float | None = None) -> float:
+        """Record a successful read of DeviceState and return the new interval."""
+        now = time.monotonic() if now is None else now
+        self.failures = 0
+        if state != self._state:
+            self._state = state
+            self._changed_at = now
+        if state in ACTIVE_STATES or now - self._changed_at < self.transition_hold:
+            self.interval = self.active
+        else:
+            self.interval = self.idle
+        return self.interval
+
+    def failed(self) -> float:
+        """Record a failed read and return the backed off interval."""
+        self.failures += 1
+        self.interval = min(self.max_backoff, self.active * 2**self.failures)
+        return self.interval
@@ -0,0 +1,512 @@
+"""Asyncio client for the Tuya 3.3 local protocol spoken by the GEN2 wallbox."""
+
+from __future__ import annotations
+
+import asyncio
+from enum import Enum
+import logging
+import random
+
+from .codec import (
+    CONTROL,
+    DP_QUERY,
+    HEART_BEAT,
+    PREFIX,
+    STATUS,
+    FrameCodec,
+    TuyaError,
+    TuyaMessage,
+    unpack_frames,
+)
+from .commands import Delay, Verify, Write
+from .metrics import ProtocolMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PORT = 6668
+
+# the device drops sessions that stay silent for ~30 s
+HEARTBEAT_INTERVAL = 10
+RECONNECT_BACKOFF_MIN = 1
+RECONNECT_BACKOFF_MAX = 60
+# the STATUS echo of a CONTROL frame follows the ack within a few 100 ms
+ECHO_TIMEOUT = 1.5
+# hard deadline of a connection check
+PROBE_TIMEOUT = 5
+
+
+class ConnectionState(str, Enum):
+    """State of the persistent device session."""
+
+    DISCONNECTED = "disconnected"
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+
+
+class ProbeResult(str, Enum):
+    """Outcome of a connection check."""
+
+    OK = "ok"
+    UNREACHABLE = "cannot_connect"
+    NO_RESPONSE = "no_response"
+    INVALID_KEY = "invalid_auth"
+    WRONG_VERSION = "wrong_version"
+
+
+class TuyaProtocol(asyncio.Protocol):
+    """Reassembles frames from the stream and hands them to the client."""
+
+    def __init__(self, on_message, on_lost, metrics: ProtocolMetrics) -> None:
+        self._buffer = bytearray()
+        self._on_message = on_message
+        self._on_lost = on_lost
+        self._metrics = metrics
+
+    def data_received(self, data: bytes) -> None:
+        self._metrics.bytes_received += len(data)
+        self._buffer += data
+        for msg in unpack_frames(self._buffer):
+            self._on_message(msg)
+
+    def connection_lost(self, exc) -> None:
+        self._on_lost(self, exc)
+
+
+class TuyaClient:
+    """Awaitable status/control access to one Tuya 3.3 device.
+
+    The client keeps one TCP session open, sends heartbeats while it is idle
+    and reconnects with jittered exponential backoff when the session drops.
+    """
+
+    def __init__(
+        self,
+        deviceid: str,
+        host: str,
+        localkey: str,
+        port: int = DEFAULT_PORT,
+        timeout: float = 3,
+        retries: int = 5,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+    ) -> None:
+        self.deviceid = deviceid
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.heartbeat_interval = heartbeat_interval
+        self.state = ConnectionState.DISCONNECTED
+        # set for good by async_close
+        self.closed = False
+        self.codec = FrameCodec(deviceid, localkey)
+        self._seqno = 0
+        self._lock = asyncio.Lock()
+        self._transport = None
+        self._protocol = None
+        self._connected = asyncio.Event()
+        self._lost = None
+        self._runner = None
+        self._last_rx = 0.0
+        self._waiters: dict[int, asyncio.Future] = {}
+        self._listeners = []
+        self.metrics = ProtocolMetrics()
+        # TrafficRecorder writing requests, replies and pushes, if recording
+        self.recorder = None
+
+    @property
+    def connected(self) -> bool:
+        return self.state == ConnectionState.CONNECTED
+
+    # session handling
+    def start(self) -> None:
+        """Start keeping the session open (idempotent)."""
+        if self.closed:
+            raise TuyaError(f"{self.host}: client closed")
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.get_running_loop().create_task(self._async_run())
+
+    async def async_close(self) -> None:
+        """Close the session for good, pending requests fail."""
+        self.closed = True
+        await self.async_disconnect()
+
+    async def async_disconnect(self) -> None:
+        """Stop reconnecting and close the session until the next request."""
+        runner, self._runner = self._runner, None
+        if runner is not None:
+            runner.cancel()
+            try:
+                await runner
+            except asyncio.CancelledError:
+                pass
+        self._disconnect()
+
+    async def async_rebind(self, host: str) -> None:
+        """Move the session to a new address, reconnecting right away."""
+        if host == self.host:
+            return
+        _LOGGER.info(f"{self.deviceid}: moved from {self.host} to {host}")
+        self.host = host
+        if self._runner is not None:
+            await self.async_disconnect()
+            self.start()
+
+    def _disconnect(self, exc: Exception | None = None) -> None:
+        if self.recorder is not None and self.connected:
+            self.recorder.write("state", state=ConnectionState.DISCONNECTED.value)
+        if self._transport is not None:
+            self._transport.abort()
+        self._transport = None
+        self._protocol = None
+        self._connected.clear()
+        self.state = ConnectionState.DISCONNECTED
+        if self._lost is not None and not self._lost.done():
+            self._lost.set_result(None)
+        self._fail_waiters(exc or TuyaError("disconnected"))
+
+    async def _async_connect(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.state = ConnectionState.CONNECTING
+        transport, protocol = await asyncio.wait_for(
+            loop.create_connection(
+                lambda: TuyaProtocol(self._on_message, self._on_lost, self.metrics),
+                self.host,
+                self.port,
+            ),
+            self.timeout,
+        )
+        self._transport = transport
+        self._protocol = protocol
+        self._lost = loop.create_future()
+        self._last_rx = loop.time()
+        self.state = ConnectionState.CONNECTED
+        if self.recorder is not None:
+            self.recorder.write("state", state=self.state.value)
+        self._connected.set()
+        _LOGGER.debug(f"{self.host}: session established")
+
+    async def _async_run(self) -> None:
+        failures = 0
+        try:
+            while True:
+                try:
+                    await self._async_connect()
+                except (OSError, asyncio.TimeoutError) as e:
+                    self._disconnect()
+                    self.metrics.record_connect(False)
+                    failures += 1
+                    delay = min(
+                        RECONNECT_BACKOFF_MAX,
+                        RECONNECT_BACKOFF_MIN * 2 ** (failures - 1),
+                    ) * random.uniform(0.5, 1.0)
+                    _LOGGER.debug(
+                        f"{self.host}: connect failed ({e!r}), retry in {delay:.1f} s"
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+
+                failures = 0
+                self.metrics.record_connect(True)
+                await self._async_keepalive()
+                # spread reconnects of many devices after a network blip
+                await asyncio.sleep(random.uniform(0, RECONNECT_BACKOFF_MIN))
+        finally:
+            self._disconnect()
+
+    async def _async_keepalive(self) -> None:
+        """Send heartbeats while the session is idle, return when it drops."""
+        loop = asyncio.get_running_loop()
+        while not self._lost.done():
+            idle = loop.time() - self._last_rx
+            if idle < self.heartbeat_interval:
+                await asyncio.wait([self._lost], timeout=self.heartbeat_interval - idle)
+                continue
+            try:
+                async with self._lock:
+                    await self._async_exchange(HEART_BEAT)
+            except (OSError, asyncio.TimeoutError, TuyaError) as e:
+                _LOGGER.debug(f"{self.host}: heartbeat failed: {e!r}")
+                self._disconnect()
+                return
+
+    def add_listener(self, listener) -> None:
+        """Call listener(data) for every DPS report the device pushes."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener) -> None:
+        self._listeners.remove(listener)
+
+    def _on_message(self, msg: TuyaMessage) -> None:
+        self._last_rx = asyncio.get_running_loop().time()
+        waiter = self._waiters.pop(msg.cmd, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(msg)
+        elif msg.cmd == STATUS:
+            self._dispatch_push(msg)
+
+    def _dispatch_push(self, msg: TuyaMessage) -> None:
+        try:
+            data = self.codec.decode_payload(msg.payload)
+        except TuyaError as e:
+            _LOGGER.debug(f"{self.host}: dropping pushed frame: {e}")
+            return
+        if not data or "dps" not in data:
+            return
+        if self.recorder is not None:
+            self.recorder.write("push", reply=data)
+        for listener in self._listeners:
+            listener(data)
+
+    def _on_lost(self, protocol, exc) -> None:
+        if protocol is not self._protocol:
+            # late notification from a session we already dropped
+            return
+        _LOGGER.debug(f"{self.host}: session lost: {exc!r}")
+        self._transport = None
+        self._disconnect(TuyaError(f"connection lost: {exc}"))
+
+    def _fail_waiters(self, exc: Exception) -> None:
+        for waiter in self._waiters.values():
+            if not waiter.done():
+                waiter.set_exception(exc)
+        self._waiters.clear()
+
+    # requests
+    async def _async_exchange(
+        self, cmd: int, dps: dict | None = None, echo_timeout: float | None = None
+    ) -> TuyaMessage:
+        """Send one frame and wait for the reply.
+
+        With echo_timeout, also wait that long for the STATUS frame the device
+        sends after applying a CONTROL frame and return it instead of the ack.
+        """
+        if self._transport is None:
+            raise TuyaError("not connected")
+        loop = asyncio.get_running_loop()
+        self._seqno += 1
+        waiter = loop.create_future()
+        self._waiters[cmd] = waiter
+        echo = None
+        if echo_timeout is not None:
+            echo = self._waiters[STATUS] = loop.create_future()
+        frame = self.codec.encode(self._seqno, cmd, dps)
+        self.metrics.bytes_sent += len(frame)
+        self._transport.write(frame)
+        try:
+            try:
+                msg = await asyncio.wait_for(waiter, self.timeout)
+            except asyncio.TimeoutError:
+                # a silent session is a dead session
+                self._disconnect()
+                raise
+            if echo is None:
+                return msg
+            try:
+                return await asyncio.wait_for(echo, echo_timeout)
+            except asyncio.TimeoutError:
+                return msg
+        finally:
+            self._waiters.pop(cmd, None)
+            if echo is not None:
+                self._waiters.pop(STATUS, None)
+
+    async def async_request(
+        self,
+        cmd: int,
+        dps: dict | None = None,
+        echo_timeout: float | None = None,
+        attempts: int | None = None,
+    ) -> dict | None:
+        """Send one command and return the decoded reply, retrying on errors."""
+        if self.recorder is None:
+            return await self._async_request(cmd, dps, echo_timeout, attempts)
+        recorder = self.recorder
+        started = recorder.clock()
+        try:
+            data = await self._async_request(cmd, dps, echo_timeout, attempts)
+        except TuyaError as e:
+            recorder.request(cmd, started, dps, error=e)
+            raise
+        recorder.request(cmd, started, dps, data)
+        return data
+
+    async def _async_request(
+        self,
+        cmd: int,
+        dps: dict | None,
+        echo_timeout: float | None,
+        attempts: int | None,
+    ) -> dict | None:
+        self.start()
+        last_error = None
+        async with self._lock:
+            for attempt in range(attempts or self.retries):
+                if self.closed:
+                    break
+                if attempt:
+                    self.metrics.retries += 1
+                try:
+                    await asyncio.wait_for(self._connected.wait(), self.timeout)
+                    msg = await self._async_exchange(cmd, dps, echo_timeout)
+                    return self.codec.decode_payload(msg.payload)
+                except (OSError, asyncio.TimeoutError, TuyaError) as e:
+                    last_error = e
+                    _LOGGER.debug(
+                        f"{self.host}: attempt {attempt + 1} of cmd {cmd} failed: {e!r}"
+                    )
+        raise TuyaError(f"{self.host}: no response ({last_error!r})") from last_error
+
+    async def async_status(self, attempts: int | None = None) -> dict:
+        """Return the device status dict ({"devId": ..., "dps": {...}})."""
+        data = await self.async_request(DP_QUERY, attempts=attempts)
+        if not data or "dps" not in data:
+            raise TuyaError(f"unexpected status response: {data}")
+        return data
+
+    async def async_set_dps(
+        self, dps: dict, echo_timeout: float = ECHO_TIMEOUT
+    ) -> dict | None:
+        """Write one or more DPS values in a single CONTROL frame.
+
+        Returns the status the device echoes back ({"dps": {...}}), or None
+        when no echo arrived within echo_timeout.
+        """
+        data = await self.async_request(
+            CONTROL, {str(key): value for key, value in dps.items()}, echo_timeout
+        )
+        if not data or "dps" not in data:
+            return None
+        return data
+
+    async def async_run_sequence(self, steps) -> dict:
+        """Run Write/Delay/Verify steps without other requests in between.
+
+        Delays are measured from the ack of the preceding write, so pulse
+        widths do not depend on how long the frames took. Returns the DPS
+        the device reported while the sequence ran.
+        """
+        if self.recorder is None:
+            return await self._async_run_sequence(steps)
+        recorder = self.recorder
+        started = recorder.clock()
+        try:
+            reported = await self._async_run_sequence(steps)
+        except TuyaError as e:
+            recorder.request("sequence", started, error=e)
+            raise
+        recorder.request("sequence", started, reply=reported)
+        return reported
+
+    async def _async_run_sequence(self, steps) -> dict:
+        self.start()
+        loop = asyncio.get_running_loop()
+        reported = {}
+        changed = asyncio.Event()
+
+        def collect(data) -> None:
+            reported.update(data["dps"])
+            changed.set()
+
+        async with self._lock:
+            try:
+                await asyncio.wait_for(self._connected.wait(), self.timeout)
+            except asyncio.TimeoutError as e:
+                raise TuyaError(f"{self.host}: not connected") from e
+            self._listeners.append(collect)
+            try:
+                mark = loop.time()
+                for step in steps:
+                    if isinstance(step, Write):
+                        dps = {str(key): value for key, value in step.values.items()}
+                        await self._async_exchange(CONTROL, dps)
+                        mark = loop.time()
+                    elif isinstance(step, Delay):
+                        await asyncio.sleep(max(0, mark + step.seconds - loop.time()))
+                    elif isinstance(step, Verify):
+                        await self._async_verify(step, reported, changed)
+                    else:
+                        raise TypeError(f"unknown step {step!r}")
+            except (OSError, asyncio.TimeoutError) as e:
+                raise TuyaError(f"{self.host}: sequence failed ({e!r})") from e
+            finally:
+                self._listeners.remove(collect)
+        return reported
+
+    async def _async_verify(self, step: Verify, reported: dict, changed) -> None:
+        expected = {str(key): value for key, value in step.values.items()}
+        deadline = asyncio.get_running_loop().time() + step.timeout
+
+        def matches() -> bool:
+            return all(reported.get(key) == value for key, value in expected.items())
+
+        while not matches():
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            changed.clear()
+            try:
+                await asyncio.wait_for(changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        if matches():
+            return
+        # the device may not push unchanged values, ask for them
+        msg = await self._async_exchange(DP_QUERY)
+        data = self.codec.decode_payload(msg.payload) or {}
+        reported.update(data.get("dps", {}))
+        if not matches():
+            raise TuyaError(f"{self.host}: device did not apply {expected}")
+
+
+async def async_probe(
+    deviceid: str,
+    host: str,
+    localkey: str,
+    port: int = DEFAULT_PORT,
+    timeout: float = PROBE_TIMEOUT,
+) -> ProbeResult:
+    """Check in one short session that host is a 3.3 device using localkey.
+
+    The wallbox accepts a single session, so instead of racing one
+    connection per protocol version the version is told from the reply.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), timeout
+        )
+    except (OSError, asyncio.TimeoutError) as e:
+        _LOGGER.debug(f"{host}: probe cannot connect: {e!r}")
+        return ProbeResult.UNREACHABLE
+
+    codec = FrameCodec(deviceid, localkey)
+    buffer = bytearray()
+    try:
+        writer.write(codec.encode(1, DP_QUERY))
+        while True:
+            chunk = await asyncio.wait_for(reader.read(1024), deadline - loop.time())
+            if not chunk:
+                return ProbeResult.NO_RESPONSE
+            buffer += chunk
+            if len(buffer) >= 4 and PREFIX.to_bytes(4, "big") not in buffer:
+                # 3.5 frames start with 0x6699, older firmwares answer in plain text
+                return ProbeResult.WRONG_VERSION
+            for msg in unpack_frames(buffer):
+                if msg.cmd != DP_QUERY:
+                    continue
+                try:
+                    data = codec.decode_payload(msg.payload)
+                except TuyaError as e:
+                    _LOGGER.debug(f"{host}: probe reply not readable: {e}")
+                    return ProbeResult.INVALID_KEY
+                if data and "dps" in data:
+                    return ProbeResult.OK
+                return ProbeResult.INVALID_KEY
+    except asyncio.TimeoutError:
+        return ProbeResult.NO_RESPONSE
+    except (OSError, TuyaError) as e:
+        _LOGGER.debug(f"{host}: probe failed: {e!r}")
+        return ProbeResult.NO_RESPONSE
+    finally:
+        writer.close()
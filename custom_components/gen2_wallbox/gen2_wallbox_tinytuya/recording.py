@@ -0,0 +1,258 @@
+"""Recording of the traffic of a wallbox and its replay in place of the device."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import copy
+import json
+import logging
+import math
+import threading
+import time
+
+from .codec import CONTROL, DP_QUERY, TuyaError
+from .metrics import ProtocolMetrics
+from .protocol import ECHO_TIMEOUT, ConnectionState
+
+_LOGGER = logging.getLogger(__name__)
+
+RECORD_VERSION = 1
+# seconds the events are buffered before they go to the file
+FLUSH_INTERVAL = 5
+
+# event names of the recorded commands
+OPS = {DP_QUERY: "status", CONTROL: "control"}
+
+
+class TrafficRecorder:
+    """Writes the traffic of one device as JSON lines.
+
+    Every line is one event, "t" is its offset in seconds from the start of
+    the recording and "ms" the round trip of a request:
+
+        {"t":0.0,"op":"start","v":1,"dev":"bff4..."}
+        {"t":0.004,"op":"state","state":"connected"}
+        {"t":0.005,"op":"status","ms":8.1,"reply":{"devId":"...","dps":{...}}}
+        {"t":2.5,"op":"control","dps":{"111":10},"ms":3000.2,"err":"..."}
+        {"t":4.0,"op":"push","reply":{"dps":{"101":"charing"}}}
+
+    Events are buffered in memory, async_flush writes them out from the
+    executor so the event loop never waits for the disk.
+    """
+
+    def __init__(self, out, deviceid: str, clock=time.monotonic) -> None:
+        self._out = out
+        self.clock = clock
+        self._lines: list[str] = []
+        self._lock = threading.Lock()
+        self._flushing = None
+        self._start = clock()
+        self.events = 0
+        self.write("start", v=RECORD_VERSION, dev=deviceid)
+
+    @classmethod
+    def open(cls, path: str, deviceid: str) -> TrafficRecorder:
+        """Append to the file at path (blocking)."""
+        return cls(open(path, "a", encoding="utf-8"), deviceid)
+
+    def write(self, op: str, at: float | None = None, **fields) -> None:
+        """Buffer one event, at is its clock time if not now."""
+        at = self.clock() if at is None else at
+        event = {"t": round(at - self._start, 3), "op": op, **fields}
+        self._lines.append(json.dumps(event, separators=(",", ":")) + "\n")
+        self.events += 1
+
+    def request(
+        self,
+        cmd: int | str,
+        started: float,
+        dps: dict | None = None,
+        reply=None,
+        error: BaseException | None = None,
+    ) -> None:
+        """Write a request that was sent at started and its outcome.
+
+        cmd is a Tuya command word or the name of a composite request.
+        """
+        fields = {"ms": round((self.clock() - started) * 1000, 1)}
+        if dps is not None:
+            fields["dps"] = dps
+        if error is not None:
+            fields["err"] = str(error)
+        else:
+            fields["reply"] = reply
+        self.write(OPS.get(cmd, cmd), started, **fields)
+
+    async def async_flush(self) -> None:
+        """Write the buffered events to the file in the executor."""
+        if not self._lines:
+            return
+        lines, self._lines = self._lines, []
+        loop = asyncio.get_running_loop()
+        self._flushing = loop.run_in_executor(None, self._write, lines)
+        # a cancelled flush still ends before async_close writes the rest
+        await asyncio.shield(self._flushing)
+
+    def _write(self, lines: list[str]) -> None:
+        with self._lock:
+            self._out.write("".join(lines))
+            self._out.flush()
+
+    async def async_close(self) -> None:
+        """Write what is buffered and close the file in the executor."""
+        if self._flushing is not None:
+            await asyncio.wait([self._flushing])
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def close(self) -> None:
+        """Write what is buffered and close the file (blocking)."""
+        lines, self._lines = self._lines, []
+        with self._lock:
+            self._out.write("".join(lines))
+            self._out.close()
+
+
+def load_events(path: str) -> list[dict]:
+    """Read a recording, skipping a line cut off by a crash."""
+    events = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                _LOGGER.debug(f"{path}: skipping broken line {line[:40]!r}")
+    return events
+
+
+class ReplayClient:
+    """Plays a recording back in place of a TuyaClient.
+
+    Requests get the recorded replies of their kind in the recorded order,
+    after the recorded round trip. Pushes and session changes happen at
+    their recorded offset from the first start(). speed > 1 replays faster,
+    math.inf without waiting at all.
+    """
+
+    def __init__(self, events: list[dict], speed: float = 1.0, host: str = "replay"):
+        start = next((event for event in events if event["op"] == "start"), {})
+        self.deviceid = start.get("dev")
+        self.host = host
+        self.port = 0
+        self.speed = speed
+        self.state = ConnectionState.DISCONNECTED
+        self.closed = False
+        self.recorder = None
+        self.metrics = ProtocolMetrics()
+        self._replies = {op: deque() for op in (*OPS.values(), "sequence")}
+        self._timeline = deque()
+        for event in events:
+            if event["op"] in self._replies:
+                self._replies[event["op"]].append(event)
+            elif event["op"] in ("push", "state"):
+                self._timeline.append(event)
+        self._listeners = []
+        self._origin = None
+        self._runner = None
+
+    @classmethod
+    def load(cls, path: str, speed: float = 1.0) -> ReplayClient:
+        return cls(load_events(path), speed)
+
+    @property
+    def connected(self) -> bool:
+        return self.state == ConnectionState.CONNECTED
+
+    @property
+    def finished(self) -> bool:
+        """Whether every recorded event was played."""
+        return not self._timeline and not any(self._replies.values())
+
+    def start(self) -> None:
+        """Start playing the timeline, continuing where it stopped."""
+        if self.closed:
+            raise TuyaError(f"{self.host}: client closed")
+        loop = asyncio.get_running_loop()
+        if self._origin is None:
+            self._origin = loop.time()
+        if self._runner is None or self._runner.done():
+            self._runner = loop.create_task(self._async_run())
+
+    async def async_close(self) -> None:
+        self.closed = True
+        await self.async_disconnect()
+
+    async def async_disconnect(self) -> None:
+        runner, self._runner = self._runner, None
+        if runner is not None:
+            runner.cancel()
+            try:
+                await runner
+            except asyncio.CancelledError:
+                pass
+        self.state = ConnectionState.DISCONNECTED
+
+    async def async_rebind(self, host: str) -> None:
+        self.host = host
+
+    def add_listener(self, listener) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener) -> None:
+        self._listeners.remove(listener)
+
+    async def _async_run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._timeline:
+            event = self._timeline[0]
+            if not math.isinf(self.speed):
+                due = self._origin + event["t"] / self.speed
+                await asyncio.sleep(max(0, due - loop.time()))
+            self._timeline.popleft()
+            if event["op"] == "state":
+                self.state = ConnectionState(event["state"])
+                if self.connected:
+                    self.metrics.record_connect(True)
+            elif event["op"] == "push":
+                for listener in list(self._listeners):
+                    listener(copy.deepcopy(event["reply"]))
+
+    async def _async_reply(self, op: str):
+        """Recorded reply of the next request of kind op."""
+        self.start()
+        try:
+            event = self._replies[op].popleft()
+        except IndexError:
+            raise TuyaError(f"{self.host}: no more recorded {op} replies") from None
+        if not math.isinf(self.speed):
+            await asyncio.sleep(event["ms"] / 1000 / self.speed)
+        if "err" in event:
+            raise TuyaError(event["err"])
+        # like a decoded frame, the caller may change what it gets
+        return copy.deepcopy(event["reply"])
+
+    async def async_request(
+        self,
+        cmd: int,
+        dps: dict | None = None,
+        echo_timeout: float | None = None,
+        attempts: int | None = None,
+    ) -> dict | None:
+        return await self._async_reply(OPS.get(cmd, str(cmd)))
+
+    async def async_status(self, attempts: int | None = None) -> dict:
+        data = await self.async_request(DP_QUERY, attempts=attempts)
+        if not data or "dps" not in data:
+            raise TuyaError(f"unexpected status response: {data}")
+        return data
+
+    async def async_set_dps(
+        self, dps: dict, echo_timeout: float = ECHO_TIMEOUT
+    ) -> dict | None:
+        data = await self.async_request(CONTROL, dps, echo_timeout)
+        if not data or "dps" not in data:
+            return None
+        return data
+
+    async def async_run_sequence(self, steps) -> dict:
+        return await self._async_reply("sequence")
@@ -0,0 +1,44 @@
+"""Concurrent polling of many wallboxes."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_CONCURRENT_POLLS = 8
+
+
+class PollScheduler:
+    """Runs device polls concurrently under a global cap.
+
+    Each device has at most one poll queued or running; a second request for
+    the same device joins the pending one instead of queueing behind it.
+    Waiting polls get a slot in FIFO order, so a slow or offline device holds
+    one slot for its own timeout and never starves the others.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_POLLS) -> None:
+        self.max_concurrent = max_concurrent
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    @property
+    def pending(self) -> int:
+        """Number of devices with a poll queued or running."""
+        return len(self._inflight)
+
+    async def async_run(self, key: str, job):
+        """Run the coroutine function job for device key and return its result."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._async_run_limited(key, job))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _async_run_limited(self, key: str, job):
+        async with self._slots:
+            _LOGGER.debug(f"Polling {key}")
+            return await job()
@@ -0,0 +1,78 @@
+"""Decoded view of one GEN2 status report."""
+
+from __future__ import annotations
+
+# the firmware reports "charing"
+_STATE_ALIASES = {"charing": "charging"}
+
+
+def _scaled(dps: dict, code: str) -> float | None:
+    value = dps.get(code)
+    return None if value is None else int(value) / 10.0
+
+
+class WallboxSnapshot:
+    """Typed, scaled values of the wallbox DPS, decoded once per update."""
+
+    __slots__ = (
+        "state",
+        "kwh",
+        "voltage",
+        "current",
+        "kw",
+        "temperature",
+        "setpoint",
+        "swipe",
+        "timestamp",
+        "seq",
+    )
+
+    def __init__(
+        self,
+        state: str | None = None,
+        kwh: float | None = None,
+        voltage: float | None = None,
+        current: float | None = None,
+        kw: float | None = None,
+        temperature: float | None = None,
+        setpoint: int | None = None,
+        swipe: bool | None = None,
+        timestamp: float = 0.0,
+        seq: int = 0,
+    ) -> None:
+        self.state = state
+        self.kwh = kwh
+        self.voltage = voltage
+        self.current = current
+        self.kw = kw
+        self.temperature = temperature
+        self.setpoint = setpoint
+        self.swipe = swipe
+        self.timestamp = timestamp
+        self.seq = seq
+
+    @classmethod
+    def from_dps(cls, dps: dict, timestamp: float, seq: int) -> WallboxSnapshot:
+        """Decode the "dps" dict of a status report (keys are DPS codes as str)."""
+        state = dps.get("101")
+        setpoint = dps.get("111")
+        return cls(
+            state=_STATE_ALIASES.get(state, state),
+            kwh=_scaled(dps, "106"),
+            voltage=_scaled(dps, "107"),
+            current=_scaled(dps, "108"),
+            kw=_scaled(dps, "109"),
+            temperature=_scaled(dps, "110"),
+            setpoint=None if setpoint is None else int(setpoint),
+            swipe=dps.get("112"),
+            timestamp=timestamp,
+            seq=seq,
+        )
+
+    @property
+    def charging(self) -> bool:
+        return self.state == "charging"
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"WallboxSnapshot({fields})"
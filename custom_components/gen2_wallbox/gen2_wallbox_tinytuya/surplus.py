@@ -0,0 +1,61 @@
+"""Charging current following the solar surplus at the grid connection."""
+
+from __future__ import annotations
+
+import math
+import time
+
+# grid power band (W) around the setpoint in which nothing is changed
+SURPLUS_HYSTERESIS = 230
+# minimal spacing (s) of two increases, decreases are applied at once
+SURPLUS_INTERVAL = 30
+
+
+class SurplusController:
+    """Closed loop from the grid power to the Set32A setpoint.
+
+    grid_power is positive while importing. The power the car may use is
+    what it draws now minus the import; it is converted to whole amps of
+    the car phases and clamped to the wallbox range.
+    """
+
+    def __init__(
+        self,
+        min_current: int,
+        max_current: int,
+        hysteresis: float = SURPLUS_HYSTERESIS,
+        min_interval: float = SURPLUS_INTERVAL,
+    ) -> None:
+        self.min_current = min_current
+        self.max_current = max_current
+        self.hysteresis = hysteresis
+        self.min_interval = min_interval
+        self._last_increase = None
+
+    def target(
+        self,
+        grid_power: float,
+        charging_power: float,
+        setpoint: int,
+        voltage: float,
+        phases: int,
+        now: float | None = None,
+    ) -> int | None:
+        """New setpoint for one grid reading, None to keep the current one."""
+        now = time.monotonic() if now is None else now
+        per_amp = voltage * phases
+        amps = (charging_power - grid_power) / per_amp
+        band = self.hysteresis / per_amp
+        if setpoint - band <= amps < setpoint + 1 + band:
+            return None
+        target = max(self.min_current, min(self.max_current, math.floor(amps)))
+        if target == setpoint:
+            return None
+        if target > setpoint:
+            if (
+                self._last_increase is not None
+                and now - self._last_increase < self.min_interval
+            ):
+                return None
+            self._last_increase = now
+        return target
@@ -0,0 +1,87 @@
+"""Coalescing write queue for DPS values."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+# minimal spacing of two writes to one device
+WRITE_INTERVAL = 1.0
+
+
+class CoalescingWriter:
+    """Per-device write queue that keeps only the latest value of each DPS.
+
+    Values submitted while a write is running or while the rate limit holds
+    replace the queued ones, so a burst of setpoint changes ends up as a
+    single write of the last value. Everything queued at once goes out in
+    one frame.
+    """
+
+    def __init__(self, write, min_interval: float = WRITE_INTERVAL) -> None:
+        self._write = write
+        self.min_interval = min_interval
+        self._pending: dict = {}
+        self._waiters: list[asyncio.Future] = []
+        self._task = None
+        self._last_write = None
+
+    def pending(self, key, default=None):
+        """Queued value of key, if any."""
+        return self._pending.get(key, default)
+
+    def submit(self, key, value) -> asyncio.Future:
+        """Queue key=value; the future resolves once it (or a newer value) is written."""
+        loop = asyncio.get_running_loop()
+        self._pending[key] = value
+        waiter = loop.create_future()
+        # callers may fire and forget, the failure is logged here
+        waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._waiters.append(waiter)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._async_drain())
+        return waiter
+
+    async def async_cancel(self) -> None:
+        """Drop queued values and stop the queue."""
+        self._pending.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _async_drain(self) -> None:
+        loop = asyncio.get_running_loop()
+        waiters = []
+        try:
+            while self._pending:
+                if self._last_write is not None:
+                    wait = self._last_write + self.min_interval - loop.time()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                batch, self._pending = self._pending, {}
+                waiters, self._waiters = self._waiters, []
+                _LOGGER.debug(f"Writing {batch}")
+                try:
+                    result = await self._write(batch)
+                except Exception as e:  # pylint: disable=broad-except
+                    _LOGGER.warning(f"Writing {batch} failed: {e}")
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_exception(e)
+                else:
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_result(result)
+                finally:
+                    self._last_write = loop.time()
+        finally:
+            # the batch in flight when cancelled and everything queued behind it
+            for waiter in (*waiters, *self._waiters):
+                waiter.cancel()
+            self._waiters = []
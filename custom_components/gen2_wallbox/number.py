@@ -7,10 +7,10 @@ import logging
 from homeassistant.components.number import NumberEntity
 from homeassistant.const import UnitOfElectricCurrent, EntityCategory
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.config_entries import ConfigEntry
 
 from .const import DOMAIN
+from .entity import GEN2WallboxEntity
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -24,54 +24,28 @@ async def async_setup_entry(
 
     entities = [WallBoxChargingCurrent(gen2)]
 
-    async_add_entities(entities, True)
+    async_add_entities(entities)
 
 
-class WallBoxChargingCurrent(NumberEntity):
+class WallBoxChargingCurrent(GEN2WallboxEntity, NumberEntity):
     """Representation actual output current of the Wallbox."""
 
-    _attr_has_entity_name = True
     _attr_name = "Charging current"
     _attr_nonunique_id = "wallbox_charging_current"
+    _source_dps = ("Set32A",)
     _attr_native_max_value = 16
     _attr_native_step = 1
     _attr_native_min_value = 8
     _attr_native_unit_of_measurement = UnitOfElectricCurrent.AMPERE
     _attr_entity_category = EntityCategory.CONFIG
 
-    def __init__(self, device) -> None:
-        super().__init__()
-        self.device = device
-
-    @property
-    def unique_id(self) -> str | None:
-        return f"{self.device.ip}-{self._attr_nonunique_id}"
-
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return the device info."""
-        return self.device.device_info
-
-    @property
-    def available(self) -> bool | None:
-        return self.device.is_available()
-
     @property
     def native_value(self) -> int | None:
-        """Return the state of the number entity."""
-        _LOGGER.debug("reading native value of Set32A")
-        data = self.device.get_value("Set32A")
-        if data == None:
-            self._attr_available = False
-            _LOGGER.debug("Set32A not available")
-            return None
-        else:
-            self._attr_available = True
-            _LOGGER.debug(f"Set32A = {data}")
-            return int(data)
+        """Return the requested or reported charging current."""
+        return self.device.target_current
 
     async def async_set_native_value(self, value: float) -> None:
         """Set the value of the entity."""
         _LOGGER.debug(f"Seting Set32A: {value}")
-        self.device.set_value("Set32A", int(value))
-        self.device.update()
+        # queued and collapsed with other pending changes, shown right away
+        self.device.request_value("Set32A", int(value))
@@ -5,21 +5,26 @@ from __future__ import annotations
 import logging
 
 from homeassistant.components.sensor import (
+    RestoreSensor,
     SensorDeviceClass,
     SensorEntity,
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
+    EntityCategory,
     UnitOfElectricCurrent,
     UnitOfEnergy,
+    UnitOfInformation,
     UnitOfPower,
     UnitOfTemperature,
+    UnitOfTime,
 )
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.core import HomeAssistant, callback
 
 from .const import DOMAIN
+from .entity import GEN2WallboxEntity
+from .gen2_wallbox_tinytuya.energy import estimated_power
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -38,247 +43,292 @@ async def async_setup_entry(
         WallBoxDeviceEnergy(gen2),
         WallBoxOutCurrent(gen2),
         WallBoxDevicePowerEstimated(gen2),
+        WallBoxSessionEnergy(gen2),
+        WallBoxChargedEnergy(gen2),
+        WallBoxPollInterval(gen2),
+        WallBoxPollLatency(gen2),
+        WallBoxPollErrors(gen2),
+        WallBoxReconnects(gen2),
+        WallBoxTraffic(gen2),
+        WallBoxDataAge(gen2),
     ]
 
-    async_add_entities(entities, True)
+    async_add_entities(entities)
 
 
-class WallBoxState(SensorEntity):
+class WallBoxState(GEN2WallboxEntity, SensorEntity):
     """Representation State of the Wallbox."""
 
-    _attr_has_entity_name = True
     _attr_name = "State"
     _attr_nonunique_id = "wallbox_state"
+    _source_dps = ("DeviceState",)
     _attr_device_class = SensorDeviceClass.ENUM
 
-    def __init__(self, device) -> None:
-        super().__init__()
-        self.device = device
-        self._attr_available = False
+    @callback
+    def _update_from_device(self) -> None:
+        """Read the sensor value from the wallbox snapshot."""
+        if (snapshot := self.device.snapshot) is not None:
+            self._attr_native_value = snapshot.state
 
-    @property
-    def unique_id(self) -> str | None:
-        return f"{self.device.ip}-{self._attr_nonunique_id}"
-
-    @property
-    def available(self) -> bool | None:
-        return self.device.is_available()
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return the device info."""
-        return self.device.device_info
-
-    async def async_update(self) -> None:
-        """Fetch new state data for the sensor.
-        This is the only method that should fetch new data for Home Assistant.
-        """
-        data = self.device.get_value("DeviceState")
-        if data == None:
-            self._attr_available = False
-        else:
-            self._attr_available = True
-            if data == "charing":
-                data = "charging"
-            self._attr_native_value = data
-
-
-class WallBoxOutCurrent(SensorEntity):
+class WallBoxOutCurrent(GEN2WallboxEntity, SensorEntity):
     """Representation actual output current of the Wallbox."""
 
-    _attr_has_entity_name = True
     _attr_name = "Charging current"
     _attr_nonunique_id = "wallbox_charging_current"
+    _source_dps = ("OutCurrent",)
     _attr_device_class = SensorDeviceClass.CURRENT
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_native_unit_of_measurement = UnitOfElectricCurrent.AMPERE
 
-    def __init__(self, device) -> None:
-        super().__init__()
-        self.device = device
-        self._attr_available = False
-
-    @property
-    def unique_id(self) -> str | None:
-        return f"{self.device.ip}-{self._attr_nonunique_id}"
+    @callback
+    def _update_from_device(self) -> None:
+        """Read the sensor value from the wallbox snapshot."""
+        if (snapshot := self.device.snapshot) is not None:
+            self._attr_native_value = snapshot.current
 
-    @property
-    def available(self) -> bool | None:
-        return self.device.is_available()
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return the device info."""
-        return self.device.device_info
-
-    async def async_update(self) -> None:
-        """Fetch new state data for the sensor.
-        This is the only method that should fetch new data for Home Assistant.
-        """
-        data = self.device.get_value("OutCurrent")
-        if data == None:
-            self._attr_available = False
-        else:
-            self._attr_available = True
-            self._attr_native_value = int(data) / 10.0
-
-
-class WallBoxTemperature(SensorEntity):
+class WallBoxTemperature(GEN2WallboxEntity, SensorEntity):
     """Representation temperature of the Wallbox."""
 
-    _attr_has_entity_name = True
     _attr_name = "Temperature"
     _attr_nonunique_id = "wallbox_temperature"
+    _source_dps = ("DeviceTemp",)
     _attr_device_class = SensorDeviceClass.TEMPERATURE
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_native_unit_of_measurement = UnitOfTemperature.CELSIUS
 
-    def __init__(self, data) -> None:
-        super().__init__()
-        self.device = data
-        self._attr_available = False
+    @callback
+    def _update_from_device(self) -> None:
+        """Read the sensor value from the wallbox snapshot."""
+        if (snapshot := self.device.snapshot) is not None:
+            self._attr_native_value = snapshot.temperature
 
-    @property
-    def unique_id(self) -> str | None:
-        return f"{self.device.ip}-{self._attr_nonunique_id}"
-
-    @property
-    def available(self) -> bool | None:
-        return self.device.is_available()
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return the device info."""
-        return self.device.device_info
-
-    async def async_update(self) -> None:
-        """Fetch new state data for the sensor.
-        This is the only method that should fetch new data for Home Assistant.
-        """
-        # self._state = await self.device.async_update()
-        data = self.device.get_value("DeviceTemp")
-        if data == None:
-            self._attr_available = False
-        else:
-            self._attr_available = True
-            self._attr_native_value = int(data) / 10.0
-
-
-class WallBoxDevicePower(SensorEntity):
+class WallBoxDevicePower(GEN2WallboxEntity, SensorEntity):
     """Representation actual output kW."""
 
-    _attr_has_entity_name = True
     _attr_name = "Power"
     _attr_nonunique_id = "wallbox_power"
+    _source_dps = ("DeviceKw",)
     _attr_device_class = SensorDeviceClass.POWER
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_native_unit_of_measurement = UnitOfPower.KILO_WATT
 
-    def __init__(self, data) -> None:
-        super().__init__()
-        self.device = data
-        self._attr_available = False
+    @callback
+    def _update_from_device(self) -> None:
+        """Read the sensor value from the wallbox snapshot."""
+        if (snapshot := self.device.snapshot) is not None:
+            self._attr_native_value = snapshot.kw
 
-    @property
-    def unique_id(self) -> str | None:
-        return f"{self.device.ip}-{self._attr_nonunique_id}"
 
-    @property
-    def available(self) -> bool | None:
-        return self.device.is_available()
-
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return the device info."""
-        return self.device.device_info
-
-    async def async_update(self) -> None:
-        """Fetch new state data for the sensor.
-        This is the only method that should fetch new data for Home Assistant.
-        """
-        data = self.device.get_value("DeviceKw")
-        if data is None:
-            self._attr_available = False
-        else:
-            self._attr_available = True
-            self._attr_native_value = int(data) / 10.0
-
-
-class WallBoxDeviceEnergy(SensorEntity):
+class WallBoxDeviceEnergy(GEN2WallboxEntity, SensorEntity):
     """Representation actual cumulative output in kWh."""
 
-    _attr_has_entity_name = True
     _attr_name = "Compsumption"
     _attr_nonunique_id = "wallbox_compsumption"
+    _source_dps = ("DeviceKwh",)
     _attr_device_class = SensorDeviceClass.ENERGY
     _attr_state_class = SensorStateClass.TOTAL
     _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
 
-    def __init__(self, data) -> None:
-        super().__init__()
-        self.device = data
-        self._attr_available = False
-
-    @property
-    def unique_id(self) -> str | None:
-        return f"{self.device.ip}-{self._attr_nonunique_id}"
+    @callback
+    def _update_from_device(self) -> None:
+        """Read the sensor value from the wallbox snapshot."""
+        if (snapshot := self.device.snapshot) is not None:
+            self._attr_native_value = snapshot.kwh
 
-    @property
-    def available(self) -> bool | None:
-        return self.device.is_available()
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return the device info."""
-        return self.device.device_info
-
-    async def async_update(self) -> None:
-        """Fetch new state data for the sensor.
-        This is the only method that should fetch new data for Home Assistant.
-        """
-        data = self.device.get_value("DeviceKwh")
-        if data is None:
-            self._attr_available = False
-        else:
-            self._attr_available = True
-            self._attr_native_value = int(data) / 10.0
-
-
-class WallBoxDevicePowerEstimated(SensorEntity):
+class WallBoxDevicePowerEstimated(GEN2WallboxEntity, SensorEntity):
     """Representation actual output kW."""
 
-    _attr_has_entity_name = True
     _attr_name = "Power Estimated"
     _attr_nonunique_id = "wallbox_power_estimated"
+    _source_dps = ("OutCurrent", "InputVoltage")
     _attr_device_class = SensorDeviceClass.POWER
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_native_unit_of_measurement = UnitOfPower.KILO_WATT
 
-    def __init__(self, data) -> None:
-        super().__init__()
-        self.device = data
-        self._attr_available = False
+    @callback
+    def _update_from_device(self) -> None:
+        """Read the sensor value from the wallbox snapshot."""
+        if (snapshot := self.device.snapshot) is not None:
+            power = estimated_power(snapshot, self.device.car_phases)
+            self._attr_native_value = None if power is None else round(power / 1000, 2)
+
+
+class WallBoxEnergySensor(GEN2WallboxEntity, RestoreSensor):
+    """Energy integrated from the power samples, continued after restarts."""
+
+    _attr_device_class = SensorDeviceClass.ENERGY
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_native_unit_of_measurement = UnitOfEnergy.WATT_HOUR
+    _attr_suggested_display_precision = 0
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        last = await self.async_get_last_sensor_data()
+        if last is not None and last.native_value is not None:
+            self._restore(float(last.native_value))
+            self._update_from_device()
+
+    def _restore(self, value: float) -> None:
+        """Hand the last saved value to the energy meter."""
+
+
+class WallBoxSessionEnergy(WallBoxEnergySensor):
+    """Representation of the energy charged in the current session."""
+
+    _attr_name = "Session energy"
+    _attr_nonunique_id = "wallbox_session_energy"
+
+    def _restore(self, value: float) -> None:
+        self.device.energy.restore(0.0, value)
+
+    @callback
+    def _update_from_device(self) -> None:
+        """Read the session energy of the wallbox energy meter."""
+        self._attr_native_value = round(self.device.energy.session, 1)
+
+
+class WallBoxChargedEnergy(WallBoxEnergySensor):
+    """Representation of all energy charged."""
+
+    _attr_name = "Charged energy"
+    _attr_nonunique_id = "wallbox_charged_energy"
+
+    def _restore(self, value: float) -> None:
+        self.device.energy.restore(value)
+
+    @callback
+    def _update_from_device(self) -> None:
+        """Read the total energy of the wallbox energy meter."""
+        self._attr_native_value = round(self.device.energy.total, 1)
 
-    @property
-    def unique_id(self) -> str | None:
-        return f"{self.device.ip}-{self._attr_nonunique_id}"
+
+class WallBoxPollInterval(GEN2WallboxEntity, SensorEntity):
+    """Representation of the current effective poll interval."""
+
+    _attr_name = "Poll interval"
+    _attr_nonunique_id = "wallbox_poll_interval"
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
 
     @property
     def available(self) -> bool | None:
-        return self.device.is_available()
+        # most interesting exactly when the wallbox is offline
+        return True
+
+    @callback
+    def _update_from_device(self) -> None:
+        """Read the interval the coordinator is using."""
+        self._attr_native_value = self.device.poll_interval
+
+
+class WallBoxDiagnosticSensor(GEN2WallboxEntity, SensorEntity):
+    """Protocol metric of the wallbox connection, disabled by default."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
 
     @property
-    def device_info(self) -> DeviceInfo:
-        """Return the device info."""
-        return self.device.device_info
-
-    async def async_update(self) -> None:
-        """Fetch new state data for the sensor.
-        This is the only method that should fetch new data for Home Assistant.
-        """
-        data = self.device.get_value("OutCurrent")
-        if data is None:
-            self._attr_available = False
-        else:
-            self._attr_available = True
-            self._attr_native_value = int(data) / 10 * 230 * self.device.car_phases
+    def available(self) -> bool | None:
+        return True
+
+
+class WallBoxPollLatency(WallBoxDiagnosticSensor):
+    """Representation of the mean status poll latency."""
+
+    _attr_name = "Poll latency"
+    _attr_nonunique_id = "wallbox_poll_latency"
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+
+    @callback
+    def _update_from_device(self) -> None:
+        """Read the latency figures of the wallbox metrics."""
+        metrics = self.device.metrics
+        mean = metrics.mean_latency
+        self._attr_native_value = None if mean is None else round(mean * 1000, 1)
+        self._attr_extra_state_attributes = {
+            "last_ms": None
+            if metrics.last_latency is None
+            else round(metrics.last_latency * 1000, 1),
+            **metrics.latency_histogram(),
+        }
+
+
+class WallBoxPollErrors(WallBoxDiagnosticSensor):
+    """Representation of the failed status polls."""
+
+    _attr_name = "Poll errors"
+    _attr_nonunique_id = "wallbox_poll_errors"
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+
+    @callback
+    def _update_from_device(self) -> None:
+        """Read the error counters of the wallbox metrics."""
+        metrics = self.device.metrics
+        self._attr_native_value = metrics.polls_failed
+        self._attr_extra_state_attributes = {
+            "polls_ok": metrics.polls_ok,
+            "retries": metrics.retries,
+            **metrics.errors,
+        }
+
+
+class WallBoxReconnects(WallBoxDiagnosticSensor):
+    """Representation of the session reconnects."""
+
+    _attr_name = "Reconnects"
+    _attr_nonunique_id = "wallbox_reconnects"
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+
+    @callback
+    def _update_from_device(self) -> None:
+        """Read the connection counters of the wallbox metrics."""
+        metrics = self.device.metrics
+        self._attr_native_value = metrics.reconnects
+        self._attr_extra_state_attributes = {
+            "session": self.device.connection_state.value,
+            "connect_failures": metrics.connect_failures,
+        }
+
+
+class WallBoxTraffic(WallBoxDiagnosticSensor):
+    """Representation of the bytes exchanged with the wallbox."""
+
+    _attr_name = "Traffic"
+    _attr_nonunique_id = "wallbox_traffic"
+    _attr_device_class = SensorDeviceClass.DATA_SIZE
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_native_unit_of_measurement = UnitOfInformation.BYTES
+
+    @callback
+    def _update_from_device(self) -> None:
+        """Read the byte counters of the wallbox metrics."""
+        metrics = self.device.metrics
+        self._attr_native_value = metrics.bytes_sent + metrics.bytes_received
+        self._attr_extra_state_attributes = {
+            "sent": metrics.bytes_sent,
+            "received": metrics.bytes_received,
+        }
+
+
+class WallBoxDataAge(WallBoxDiagnosticSensor):
+    """Representation of the age of the cached wallbox data."""
+
+    _attr_name = "Data age"
+    _attr_nonunique_id = "wallbox_data_age"
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+
+    @callback
+    def _update_from_device(self) -> None:
+        """Read how old the cached data is."""
+        age = self.device.data_age
+        self._attr_native_value = None if age is None else round(age)
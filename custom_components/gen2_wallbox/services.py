@@ -0,0 +1,116 @@
+"""Services changing the charging current of the targeted wallboxes."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_AREA_ID, ATTR_DEVICE_ID, ATTR_ENTITY_ID
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv, device_registry as dr
+from homeassistant.helpers.service import async_extract_config_entry_ids
+
+from .const import DOMAIN, MAX_CURRENT, MIN_CURRENT
+from .coordinator import GEN2WallboxCoordinator
+from .gen2_wallbox_tinytuya.gen2wallbox import GEN2_Wallbox
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _max_current(wallbox: GEN2_Wallbox) -> int:
+    # a site load balancer may allow less
+    return min(MAX_CURRENT, wallbox.current_limit or MAX_CURRENT)
+
+
+# new setpoint from the requested one
+SERVICES = {
+    "increase_current": lambda wallbox, actual: min(_max_current(wallbox), actual + 1),
+    "decrease_current": lambda wallbox, actual: max(MIN_CURRENT, actual - 1),
+    "set_minimal_current": lambda wallbox, actual: MIN_CURRENT,
+    "set_maximal_current": lambda wallbox, actual: _max_current(wallbox),
+}
+
+# a call without a target must not change every wallbox of the site
+SERVICE_SCHEMA = vol.All(
+    cv.make_entity_service_schema({}),
+    cv.has_at_least_one_key(ATTR_ENTITY_ID, ATTR_DEVICE_ID, ATTR_AREA_ID),
+)
+
+
+async def _async_targets(
+    hass: HomeAssistant, call: ServiceCall
+) -> dict[str, GEN2WallboxCoordinator]:
+    """Coordinators of the targeted wallboxes by entry id."""
+    entry_ids = await async_extract_config_entry_ids(hass, call)
+    return {
+        entry_id: coordinator
+        for entry_id, coordinator in hass.data[DOMAIN].items()
+        if entry_id in entry_ids and isinstance(coordinator, GEN2WallboxCoordinator)
+    }
+
+
+async def _async_apply(wallbox: GEN2_Wallbox, change) -> int | None:
+    """Write the new setpoint and return the one the device confirmed."""
+    actual = wallbox.target_current
+    if not wallbox.available or actual is None:
+        raise HomeAssistantError(f"Wallbox {wallbox.ip} is not available")
+    current = change(wallbox, actual)
+    if current != actual:
+        await wallbox.request_value("Set32A", current)
+    return wallbox.snapshot.setpoint
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration, once for all wallboxes."""
+    if hass.services.has_service(DOMAIN, next(iter(SERVICES))):
+        return
+
+    async def async_change_current(call: ServiceCall) -> ServiceResponse:
+        _LOGGER.debug(f"call {call.service}")
+        change = SERVICES[call.service]
+        if not (coordinators := await _async_targets(hass, call)):
+            raise HomeAssistantError("No GEN2 wallbox targeted")
+        results = await asyncio.gather(
+            *(_async_apply(c.wallbox, change) for c in coordinators.values()),
+            return_exceptions=True,
+        )
+
+        devices = dr.async_get(hass)
+        response = {}
+        failed = []
+        for coordinator, result in zip(coordinators.values(), results):
+            wallbox = coordinator.wallbox
+            if isinstance(result, Exception):
+                _LOGGER.warning(f"{call.service} of {wallbox.ip} failed: {result}")
+                failed.append(wallbox.ip)
+                continue
+            device = devices.async_get_device(
+                identifiers=wallbox.device_info["identifiers"]
+            )
+            response[device.id if device else wallbox.deviceid] = result
+        if failed:
+            raise HomeAssistantError(f"{call.service} failed for {', '.join(failed)}")
+        return {"current": response}
+
+    for service in SERVICES:
+        hass.services.async_register(
+            DOMAIN,
+            service,
+            async_change_current,
+            schema=SERVICE_SCHEMA,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+
+def async_unload_services(hass: HomeAssistant) -> None:
+    """Remove the services once the last wallbox is gone."""
+    for service in SERVICES:
+        hass.services.async_remove(DOMAIN, service)
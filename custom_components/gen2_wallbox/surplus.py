@@ -0,0 +1,69 @@
+"""Solar surplus charging driven by a grid power sensor."""
+
+from __future__ import annotations
+
+import logging
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import UnitOfPower
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_state_change_event
+
+from .const import (
+    DEFAULT_SURPLUS_HYSTERESIS,
+    DEFAULT_SURPLUS_INTERVAL,
+    MAX_CURRENT,
+    MIN_CURRENT,
+)
+from .gen2_wallbox_tinytuya.energy import NOMINAL_VOLTAGE
+from .gen2_wallbox_tinytuya.gen2wallbox import GEN2_Wallbox
+from .gen2_wallbox_tinytuya.surplus import SurplusController
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@callback
+def async_setup_surplus(
+    hass: HomeAssistant, entry: ConfigEntry, wallbox: GEN2_Wallbox
+) -> None:
+    """Follow the grid power sensor of the entry options, if one is set."""
+    if not (grid_entity := entry.options.get("grid_power_entity")):
+        return
+    controller = SurplusController(
+        MIN_CURRENT,
+        MAX_CURRENT,
+        hysteresis=entry.options.get("surplus_hysteresis", DEFAULT_SURPLUS_HYSTERESIS),
+        min_interval=entry.options.get("surplus_interval", DEFAULT_SURPLUS_INTERVAL),
+    )
+
+    @callback
+    def follow_grid_power(event: Event) -> None:
+        state = event.data["new_state"]
+        if state is None or not wallbox.available or not wallbox.is_charging():
+            return
+        try:
+            grid_power = float(state.state)
+        except ValueError:
+            return
+        if state.attributes.get("unit_of_measurement") == UnitOfPower.KILO_WATT:
+            grid_power *= 1000
+        setpoint = wallbox.target_current
+        charging_power = wallbox.energy.power
+        if setpoint is None or charging_power is None:
+            return
+        # stay within the share of a site load balancer
+        controller.max_current = min(MAX_CURRENT, wallbox.current_limit or MAX_CURRENT)
+        target = controller.target(
+            grid_power,
+            charging_power,
+            setpoint,
+            wallbox.snapshot.voltage or NOMINAL_VOLTAGE,
+            wallbox.car_phases,
+        )
+        if target is not None:
+            _LOGGER.debug(f"{wallbox.ip}: grid {grid_power} W, current {target} A")
+            wallbox.request_value("Set32A", target)
+
+    entry.async_on_unload(
+        async_track_state_change_event(hass, [grid_entity], follow_grid_power)
+    )
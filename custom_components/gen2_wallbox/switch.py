@@ -7,11 +7,9 @@ import logging
 from homeassistant.components.switch import SwitchDeviceClass, SwitchEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import DeviceInfo
-
-from .gen2_wallbox_tinytuya.gen2wallbox import GEN2_Wallbox
 
 from .const import DOMAIN
+from .entity import GEN2WallboxEntity
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -24,54 +22,26 @@ async def async_setup_entry(
 
     entities = [WallBoxChargingSwitch(gen2)]
 
-    async_add_entities(entities, True)
+    async_add_entities(entities)
 
 
-class WallBoxChargingSwitch(SwitchEntity):
+class WallBoxChargingSwitch(GEN2WallboxEntity, SwitchEntity):
     """Representation actual output current of the Wallbox."""
 
-    _attr_has_entity_name = True
     _attr_name = "Charging switch"
     _attr_nonunique_id = "wallbox_charging_switch"
+    _source_dps = ("DeviceState",)
     _attr_device_class = SwitchDeviceClass.OUTLET
 
-    def __init__(self, device: GEN2_Wallbox) -> None:
-        super().__init__()
-        self.device = device
-
-    @property
-    def unique_id(self) -> str | None:
-        return f"{self.device.ip}-{self._attr_nonunique_id}"
-
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return the device info."""
-        return self.device.device_info
-
-    @property
-    def available(self) -> bool | None:
-        return self.device.is_available()
-
     @property
     def is_on(self) -> bool | None:
         """Return the state of the number entity."""
-        data = self.device.get_value("DeviceState")
-        if data == None:
-            self._attr_available = False
-            return False
-        else:
-            self._attr_available = True
-            if data == "charing":
-                return True
+        return self.device.is_charging()
 
-        return False
-
-    def turn_on(self, **kwargs):
+    async def async_turn_on(self, **kwargs):
         """Turn the entity on."""
-        self.device.start_charging()
-        self.device.update()
+        await self.device.async_start_charging()
 
-    def turn_off(self, **kwargs):
-        """Turn the entity on."""
-        self.device.start_charging()
-        self.device.update()
+    async def async_turn_off(self, **kwargs):
+        """Turn the entity off."""
+        await self.device.async_stop_charging()
@@ -0,0 +1,190 @@
+"""Localhost GEN2 wallbox speaking the Tuya 3.3 protocol, for tests and benchmarks."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import time
+
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.codec import (
+    CONTROL,
+    DP_QUERY,
+    HEART_BEAT,
+    PROTOCOL_33_HEADER,
+    STATUS,
+    TuyaCipher,
+    pack_message,
+    unpack_frames,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+DEVICE_ID = "bff4sim0000000000000"
+LOCAL_KEY = "0123456789abcdef"
+
+# DPS map of the GEN2 as reported by the firmware, scaled values are x10
+GEN2_DPS = {
+    "101": "connected",
+    "106": 1234,
+    "107": 2301,
+    "108": 0,
+    "109": 0,
+    "110": 253,
+    "111": 16,
+    "112": False,
+}
+
+# a car plugs in, charges for a while and is done
+CHARGING_SESSION = [
+    (0.5, {"101": "connected"}),
+    (0.5, {"101": "charing", "108": 160, "109": 110}),
+    (1.0, {"106": 1235, "110": 281}),
+    (1.0, {"101": "done", "108": 0, "109": 0}),
+]
+
+
+class WallboxSimulator:
+    """One simulated wallbox listening on 127.0.0.1.
+
+    latency delays every reply, loss drops that fraction of replies,
+    max_connections closes sessions beyond the limit like the real MCU and
+    script is a list of (delay, dps changes) pushed to open sessions.
+    """
+
+    def __init__(
+        self,
+        deviceid: str = DEVICE_ID,
+        localkey: str = LOCAL_KEY,
+        latency: float = 0.0,
+        loss: float = 0.0,
+        max_connections: int = 1,
+        script: list | None = None,
+        seed: int | None = None,
+    ) -> None:
+        self.deviceid = deviceid
+        self.localkey = localkey
+        self.latency = latency
+        self.loss = loss
+        self.max_connections = max_connections
+        self.script = script or []
+        self.dps = dict(GEN2_DPS)
+        self.cipher = TuyaCipher(localkey)
+        self.host = "127.0.0.1"
+        self.port = None
+        self.requests = 0
+        self.connections = 0
+        self.rejected = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._random = random.Random(seed)
+        self._sessions: set[_SimSession] = set()
+        self._server = None
+        self._script_task = None
+
+    async def async_start(self) -> int:
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(
+            lambda: _SimSession(self), self.host, 0
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.script:
+            self._script_task = loop.create_task(self._async_run_script())
+        return self.port
+
+    async def async_stop(self) -> None:
+        if self._script_task is not None:
+            self._script_task.cancel()
+        for session in list(self._sessions):
+            session.transport.abort()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def apply(self, changes: dict) -> None:
+        """Change DPS values and push them like the firmware does."""
+        self.dps.update(changes)
+        for session in list(self._sessions):
+            session.push(changes)
+
+    async def _async_run_script(self) -> None:
+        for delay, changes in self.script:
+            await asyncio.sleep(delay)
+            self.apply(changes)
+
+    def control(self, changes: dict) -> dict:
+        """Apply a CONTROL request, emulating the SwipeRfid pulse logic."""
+        if changes.get("112") is False and self.dps.get("112") is True:
+            if self.dps["101"] == "charing":
+                changes.update({"101": "connected", "108": 0, "109": 0})
+            else:
+                current = int(changes.get("111", self.dps["111"]))
+                changes.update({"101": "charing", "108": current * 10})
+        self.dps.update(changes)
+        return changes
+
+    def encrypt(self, body: dict) -> bytes:
+        return self.cipher.encrypt(json.dumps(body, separators=(",", ":")).encode())
+
+
+class _SimSession(asyncio.Protocol):
+    def __init__(self, sim: WallboxSimulator) -> None:
+        self.sim = sim
+        self.transport = None
+        self._buffer = bytearray()
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+        if len(self.sim._sessions) >= self.sim.max_connections:
+            self.sim.rejected += 1
+            transport.close()
+            return
+        self.sim.connections += 1
+        self.sim._sessions.add(self)
+
+    def connection_lost(self, exc) -> None:
+        self.sim._sessions.discard(self)
+
+    def data_received(self, data: bytes) -> None:
+        self.sim.bytes_in += len(data)
+        self._buffer += data
+        for msg in unpack_frames(self._buffer):
+            self.sim.requests += 1
+            if self.sim._random.random() < self.sim.loss:
+                continue
+            self._reply(msg)
+
+    def _send(self, frame: bytes) -> None:
+        if self.sim.latency:
+            asyncio.get_running_loop().call_later(self.sim.latency, self._write, frame)
+        else:
+            self._write(frame)
+
+    def _write(self, frame: bytes) -> None:
+        if not self.transport.is_closing():
+            self.sim.bytes_out += len(frame)
+            self.transport.write(frame)
+
+    def _reply(self, msg) -> None:
+        retcode = b"\x00\x00\x00\x00"
+        if msg.cmd == DP_QUERY:
+            body = {"devId": self.sim.deviceid, "dps": self.sim.dps}
+            self._send(pack_message(msg.seqno, DP_QUERY, retcode + self.sim.encrypt(body)))
+        elif msg.cmd == CONTROL:
+            request = json.loads(
+                self.sim.cipher.decrypt(msg.payload[len(PROTOCOL_33_HEADER) :])
+            )
+            changes = self.sim.control(request["dps"])
+            self._send(pack_message(msg.seqno, CONTROL, retcode))
+            self._send(self._status_frame(changes))
+        elif msg.cmd == HEART_BEAT:
+            self._send(pack_message(msg.seqno, HEART_BEAT, retcode))
+
+    def _status_frame(self, changes: dict) -> bytes:
+        body = {"devId": self.sim.deviceid, "dps": changes, "t": int(time.time())}
+        payload = b"\x00\x00\x00\x00" + PROTOCOL_33_HEADER + self.sim.encrypt(body)
+        return pack_message(0, STATUS, payload)
+
+    def push(self, changes: dict) -> None:
+        self._send(self._status_frame(changes))
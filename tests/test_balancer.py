@@ -0,0 +1,98 @@
+"""Sharing a site current budget between wallboxes."""
+import time
+from types import SimpleNamespace
+
+from custom_components.gen2_wallbox.balancer import SiteBalancer
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.balancer import (
+    Demand,
+    allocate,
+)
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.gen2wallbox import (
+    GEN2_Wallbox,
+)
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.writer import (
+    CoalescingWriter,
+)
+
+from .simulator import GEN2_DPS, LOCAL_KEY
+
+
+def _demand(key, weight=1.0, cost=1.0, min_current=8, max_current=16):
+    return Demand(key, cost, weight, min_current, max_current)
+
+
+def test_allocate_shares_by_weight():
+    assert allocate(20, [_demand("a"), _demand("b")]) == {"a": 10, "b": 10}
+    assert allocate(27, [_demand("a", 2), _demand("b")]) == {"a": 16, "b": 11}
+    assert allocate(30, [_demand("a", 2), _demand("b")]) == {"a": 16, "b": 14}
+    # the amp lost to rounding goes to the largest remainder
+    assert allocate(21, [_demand("a", 1.2), _demand("b")]) == {"a": 11, "b": 10}
+
+
+def test_allocate_minimum_and_shortage():
+    # a low weight still gets the minimal current
+    assert allocate(26, [_demand("a", 10), _demand("b")]) == {"a": 16, "b": 10}
+    assert allocate(24, [_demand("a", 10), _demand("b")]) == {"a": 16, "b": 8}
+    # not even the minimum fits: everybody gets it, the caller warns
+    assert allocate(12, [_demand("a"), _demand("b")]) == {"a": 8, "b": 8}
+    assert allocate(50, []) == {}
+
+
+def test_allocate_caps_and_costs():
+    capped = [_demand("a", max_current=10), _demand("b")]
+    assert allocate(30, capped) == {"a": 10, "b": 16}
+    assert allocate(100, capped) == {"a": 10, "b": 16}
+    # a budget in W: a three phase car costs three times a single phase one
+    power = [_demand("a", cost=690), _demand("b", cost=230)]
+    assert allocate(11040, power) == {"a": 12, "b": 12}
+
+
+def _charging_wallbox(n: int, writes: list) -> GEN2_Wallbox:
+    wallbox = GEN2_Wallbox(f"dev{n}", f"10.0.0.{n}", LOCAL_KEY)
+    wallbox.restore({"dps": {**GEN2_DPS, "101": "charing", "111": 16}}, time.time())
+    wallbox.stale = False
+    wallbox.available = True
+
+    async def write(values):
+        writes.append((n, values))
+
+    wallbox.writer = CoalescingWriter(write, min_interval=0)
+    return wallbox
+
+
+async def test_balancer_holds_the_budget(hass):
+    writes = []
+    wallboxes = [_charging_wallbox(n, writes) for n in range(2)]
+    balancer = SiteBalancer(hass, limit=20)
+    for n, wallbox in enumerate(wallboxes):
+        coordinator = SimpleNamespace(
+            wallbox=wallbox, async_add_listener=lambda listener: lambda: None
+        )
+        balancer.add(str(n), coordinator, 1.0)
+    balancer.async_rebalance()
+    await hass.async_block_till_done()
+    assert sorted(writes) == [(0, {"Set32A": 10}), (1, {"Set32A": 10})]
+
+    # the number entity cannot go above the share
+    writes.clear()
+    await wallboxes[0].request_value("Set32A", 16)
+    assert writes == [(0, {"Set32A": 10})]
+
+    # a setpoint raised behind our back is written again, a lower one kept
+    writes.clear()
+    for wallbox, setpoint in zip(wallboxes, (16, 8)):
+        wallbox._optimistic.clear()
+        wallbox._merge_dps({"111": setpoint})
+    balancer.async_rebalance()
+    await hass.async_block_till_done()
+    assert writes == [(0, {"Set32A": 10})]
+
+    # a larger share after the other car stopped does not raise the lower one
+    writes.clear()
+    wallboxes[0]._merge_dps({"111": 8})
+    wallboxes[1]._merge_dps({"101": "connected"})
+    balancer.async_rebalance()
+    await hass.async_block_till_done()
+    assert writes == []
+    assert wallboxes[0].current_limit == 16
+    assert wallboxes[1].current_limit is None
@@ -0,0 +1,173 @@
+"""Performance benchmarks of GEN2_Wallbox against the local simulator.
+
+Every benchmark records its figures; set GEN2_BENCH_OUTPUT to a file name
+to get them as JSON for comparing versions.
+"""
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import pytest
+
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.gen2wallbox import (
+    GEN2_Wallbox,
+)
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.scheduler import (
+    PollScheduler,
+)
+
+from .simulator import CHARGING_SESSION, DEVICE_ID, LOCAL_KEY, WallboxSimulator
+
+# the simulator listens on 127.0.0.1
+pytestmark = [pytest.mark.benchmark, pytest.mark.usefixtures("socket_enabled")]
+
+POLLS = 50
+RESULTS = {}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def bench_report():
+    """Collect the results of this module and dump them at the end."""
+    yield RESULTS
+    path = os.environ.get("GEN2_BENCH_OUTPUT")
+    if path:
+        with open(path, "w", encoding="utf-8") as out:
+            json.dump(RESULTS, out, indent=2, sort_keys=True)
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+async def _wallbox(sim: WallboxSimulator, deviceid=DEVICE_ID) -> GEN2_Wallbox:
+    wallbox = GEN2_Wallbox(deviceid, sim.host, LOCAL_KEY)
+    wallbox.device.port = sim.port
+    # always go to the device, not to the pushed cache
+    wallbox.consistency_interval = 0
+    return wallbox
+
+
+async def test_poll_latency():
+    """Round trip of one status poll over the persistent session."""
+    sim = WallboxSimulator()
+    await sim.async_start()
+    wallbox = await _wallbox(sim)
+    try:
+        await wallbox.async_update()
+        samples = []
+        cpu = time.process_time()
+        for _ in range(POLLS):
+            start = time.perf_counter()
+            await wallbox.async_update()
+            samples.append(time.perf_counter() - start)
+        cpu = time.process_time() - cpu
+    finally:
+        await wallbox.async_close()
+        await sim.async_stop()
+
+    assert wallbox.is_available()
+    assert sim.connections == 1
+    RESULTS["poll_latency"] = _percentiles(samples)
+    RESULTS["cpu_per_poll_ms"] = round(cpu / POLLS * 1000, 3)
+    metrics = wallbox.metrics
+    RESULTS["bytes_per_poll"] = (
+        metrics.bytes_sent + metrics.bytes_received
+    ) // metrics.polls_ok
+
+
+async def test_command_round_trip():
+    """Set32A write until the echoed value is in the cache."""
+    sim = WallboxSimulator()
+    await sim.async_start()
+    wallbox = await _wallbox(sim)
+    try:
+        await wallbox.async_update()
+        samples = []
+        for i in range(POLLS):
+            value = 8 + i % 9
+            start = time.perf_counter()
+            await wallbox.async_set_value("Set32A", value)
+            samples.append(time.perf_counter() - start)
+            assert wallbox.snapshot.setpoint == value
+    finally:
+        await wallbox.async_close()
+        await sim.async_stop()
+
+    # every write was answered by its echo, no extra status read
+    assert sim.requests == POLLS + 1
+    RESULTS["command_round_trip"] = _percentiles(samples)
+
+
+async def test_pushed_session():
+    """Scripted charging session arrives without polling."""
+    sim = WallboxSimulator(script=CHARGING_SESSION)
+    await sim.async_start()
+    wallbox = await _wallbox(sim)
+    seen = []
+    wallbox.register_callback(lambda: seen.append(wallbox.snapshot.state))
+    try:
+        await wallbox.async_update()
+        await asyncio.sleep(sum(delay for delay, _ in CHARGING_SESSION) + 0.5)
+    finally:
+        await wallbox.async_close()
+        await sim.async_stop()
+
+    assert "charging" in seen
+    assert wallbox.snapshot.state == "done"
+    assert sim.requests == 1
+
+
+@pytest.mark.parametrize("count", [1, 4, 12])
+async def test_scaling(count):
+    """Cycle time of N wallboxes with 200 ms latency each, polled concurrently."""
+    latency = 0.2
+    sims = [WallboxSimulator(latency=latency) for _ in range(count)]
+    for sim in sims:
+        await sim.async_start()
+    scheduler = PollScheduler(max_concurrent=count)
+    wallboxes = [await _wallbox(sim, f"{DEVICE_ID[:-2]}{i:02d}") for i, sim in enumerate(sims)]
+    for wallbox in wallboxes:
+        wallbox.scheduler = scheduler
+    try:
+        cycles = []
+        for _ in range(3):
+            start = time.perf_counter()
+            await asyncio.gather(*(wallbox.async_update() for wallbox in wallboxes))
+            cycles.append(time.perf_counter() - start)
+    finally:
+        for wallbox in wallboxes:
+            await wallbox.async_close()
+        for sim in sims:
+            await sim.async_stop()
+
+    assert all(wallbox.is_available() for wallbox in wallboxes)
+    # bounded by the slowest device, not by the sum of all of them
+    assert min(cycles) < latency * 3
+    RESULTS[f"cycle_{count}_wallboxes_ms"] = round(min(cycles) * 1000, 3)
+
+
+async def test_lossy_device_recovers():
+    """Availability on a link dropping 20 % of the replies."""
+    sim = WallboxSimulator(loss=0.2, seed=1)
+    await sim.async_start()
+    wallbox = await _wallbox(sim)
+    wallbox.device.timeout = 0.2
+    ok = 0
+    try:
+        for _ in range(20):
+            await wallbox.async_update()
+            ok += wallbox.is_available()
+    finally:
+        await wallbox.async_close()
+        await sim.async_stop()
+
+    assert ok >= 15
+    RESULTS["lossy_availability"] = ok / 20
+    RESULTS["lossy_reconnects"] = sim.connections - 1
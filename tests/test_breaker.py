@@ -0,0 +1,77 @@
+"""Circuit breaker for wallboxes that stopped answering."""
+import pytest
+
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.breaker import (
+    BreakerState,
+    CircuitBreaker,
+)
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.gen2wallbox import (
+    GEN2_Wallbox,
+)
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.protocol import TuyaError
+
+from .simulator import DEVICE_ID, LOCAL_KEY
+
+
+def _opened(now=0.0) -> CircuitBreaker:
+    breaker = CircuitBreaker(threshold=3, backoff_min=30, backoff_max=100)
+    for _ in range(3):
+        breaker.failure(now)
+    return breaker
+
+
+def test_opens_at_threshold():
+    breaker = CircuitBreaker(threshold=3)
+    assert not breaker.failure(0)
+    assert not breaker.failure(0)
+    assert breaker.allow(0)
+    assert breaker.failure(0)
+    assert breaker.state == BreakerState.OPEN
+    assert not breaker.allow(1)
+    assert breaker.rejected == 1
+    # a success in between starts counting again
+    breaker = CircuitBreaker(threshold=3)
+    breaker.failure(0)
+    breaker.failure(0)
+    breaker.success()
+    assert not breaker.failure(0)
+
+
+def test_backoff_schedule():
+    breaker = _opened()
+    retries = []
+    now = 0.0
+    for _ in range(4):
+        retries.append(breaker.retry_in(now))
+        now += breaker.retry_in(now)
+        assert breaker.allow(now)
+        assert breaker.state == BreakerState.HALF_OPEN
+        # one probe at a time
+        assert not breaker.allow(now)
+        assert breaker.failure(now)
+    assert retries == [30, 60, 100, 100]
+
+
+def test_half_open_probe():
+    breaker = _opened()
+    assert breaker.allow(30)
+    breaker.success()
+    assert breaker.closed
+    assert breaker.backoff == 30
+    assert breaker.as_dict()["state"] == "closed"
+
+
+async def test_writes_rejected_while_open():
+    wallbox = GEN2_Wallbox(DEVICE_ID, "192.0.2.1", LOCAL_KEY)
+    for _ in range(wallbox.breaker.threshold):
+        wallbox.breaker.failure()
+    try:
+        with pytest.raises(TuyaError, match="command not sent"):
+            await wallbox.async_set_value("Set32A", 10)
+        with pytest.raises(TuyaError, match="command not sent"):
+            await wallbox.async_start_charging()
+        # nothing went to the device
+        assert wallbox.metrics.bytes_sent == 0
+        assert wallbox.device.connected is False
+    finally:
+        await wallbox.async_close()
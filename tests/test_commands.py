@@ -0,0 +1,86 @@
+"""Timed command sequences against the simulated wallbox."""
+import asyncio
+
+import pytest
+
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.commands import (
+    Verify,
+    Write,
+)
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.gen2wallbox import (
+    GEN2_Wallbox,
+)
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.protocol import TuyaError
+
+from .simulator import DEVICE_ID, LOCAL_KEY, WallboxSimulator
+
+pytestmark = pytest.mark.usefixtures("socket_enabled")
+
+PULSE = 0.3
+
+
+@pytest.fixture
+async def sim():
+    sim = WallboxSimulator()
+    await sim.async_start()
+    yield sim
+    await sim.async_stop()
+
+
+@pytest.fixture
+async def wallbox(sim):
+    wallbox = GEN2_Wallbox(DEVICE_ID, sim.host, LOCAL_KEY)
+    wallbox.device.port = sim.port
+    wallbox.device.timeout = 0.5
+    wallbox.consistency_interval = 0
+    wallbox.SWIPE_PULSE = PULSE
+    yield wallbox
+    await wallbox.async_close()
+
+
+def _record_controls(sim) -> list:
+    """Loop time and DPS of every CONTROL request the simulator gets."""
+    controls = []
+    control = sim.control
+
+    def record(changes):
+        controls.append((asyncio.get_running_loop().time(), dict(changes)))
+        return control(changes)
+
+    sim.control = record
+    return controls
+
+
+def _pulse_width(controls) -> float:
+    (on_at, on), (off_at, off) = controls
+    assert (on, off) == ({"112": True}, {"112": False})
+    return off_at - on_at
+
+
+async def test_start_and_stop_charging(sim, wallbox):
+    """The SwipeRfid pulse has its width and shares the polling session."""
+    controls = _record_controls(sim)
+    await wallbox.async_update()
+    assert not wallbox.is_charging()
+
+    await wallbox.async_start_charging()
+    assert PULSE <= _pulse_width(controls) < PULSE + 0.1
+    assert wallbox.is_charging()
+    assert sim.dps["101"] == "charing"
+
+    controls.clear()
+    await wallbox.async_stop_charging()
+    assert PULSE <= _pulse_width(controls) < PULSE + 0.1
+    assert not wallbox.is_charging()
+    assert sim.dps["101"] == "connected"
+    assert sim.connections == 1
+
+
+async def test_verify_timeout_fails(sim, wallbox):
+    """A value the device never reports, even when asked, fails the sequence."""
+    await wallbox.async_update()
+    steps = [Write({"Set32A": 10}), Verify({"Set32A": 12}, timeout=0.2)]
+    with pytest.raises(TuyaError, match="did not apply"):
+        await wallbox.async_run_commands(steps)
+    assert sim.dps["111"] == 10
+    assert sim.connections == 1
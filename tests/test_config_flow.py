@@ -0,0 +1,106 @@
+"""Connection check of the config flow against the simulated wallbox."""
+import asyncio
+from functools import partial
+from unittest.mock import patch
+
+from homeassistant import config_entries
+from homeassistant.data_entry_flow import FlowResultType
+import pytest
+
+from custom_components.gen2_wallbox.const import DOMAIN
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.protocol import (
+    ProbeResult,
+    async_probe,
+)
+
+from .simulator import DEVICE_ID, LOCAL_KEY, WallboxSimulator
+
+pytestmark = pytest.mark.usefixtures("socket_enabled")
+
+WRONG_KEY = "fedcba9876543210"
+
+
+@pytest.fixture
+async def sim():
+    sim = WallboxSimulator()
+    await sim.async_start()
+    yield sim
+    await sim.async_stop()
+
+
+async def test_probe_ok(sim):
+    assert await async_probe(DEVICE_ID, sim.host, LOCAL_KEY, sim.port) is ProbeResult.OK
+    assert sim.connections == 1
+
+
+async def test_probe_invalid_key(sim):
+    result = await async_probe(DEVICE_ID, sim.host, WRONG_KEY, sim.port)
+    assert result is ProbeResult.INVALID_KEY
+
+
+async def test_probe_no_response(sim):
+    sim.latency = 0.3
+    result = await async_probe(DEVICE_ID, sim.host, LOCAL_KEY, sim.port, timeout=0.1)
+    assert result is ProbeResult.NO_RESPONSE
+    # let the late reply go out
+    await asyncio.sleep(0.5)
+
+
+async def test_probe_unreachable(sim):
+    await sim.async_stop()
+    result = await async_probe(DEVICE_ID, sim.host, LOCAL_KEY, sim.port)
+    assert result is ProbeResult.UNREACHABLE
+
+
+async def test_probe_wrong_version():
+    """A device answering without the 3.3 prefix, like 3.5 or plain text."""
+
+    async def answer(reader, writer):
+        await reader.read(1024)
+        writer.write(b"\x00\x00\x66\x99\x00\x00\x00\x00")
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(answer, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        result = await async_probe(DEVICE_ID, "127.0.0.1", LOCAL_KEY, port)
+    finally:
+        server.close()
+        await server.wait_closed()
+    assert result is ProbeResult.WRONG_VERSION
+
+
+async def _start(hass):
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": config_entries.SOURCE_USER}
+    )
+    return result["flow_id"]
+
+
+async def _submit(hass, flow_id, sim, localkey):
+    with patch(
+        "custom_components.gen2_wallbox.config_flow.async_probe",
+        partial(async_probe, port=sim.port),
+    ), patch("custom_components.gen2_wallbox.async_setup_entry", return_value=True):
+        return await hass.config_entries.flow.async_configure(
+            flow_id,
+            {"ip": sim.host, "deviceid": DEVICE_ID, "localkey": localkey},
+        )
+
+
+async def test_flow_reports_probe_result(hass, sim):
+    flow_id = await _start(hass)
+    result = await _submit(hass, flow_id, sim, WRONG_KEY)
+    assert result["type"] == FlowResultType.FORM
+    assert result["errors"] == {"base": "invalid_auth"}
+
+    await sim.async_stop()
+    result = await _submit(hass, flow_id, sim, LOCAL_KEY)
+    assert result["errors"] == {"base": "cannot_connect"}
+
+
+async def test_flow_creates_entry(hass, sim):
+    result = await _submit(hass, await _start(hass), sim, LOCAL_KEY)
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["data"]["localkey"] == LOCAL_KEY
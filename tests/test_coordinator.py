@@ -0,0 +1,77 @@
+"""Pushed reports and the polls of the coordinator."""
+import asyncio
+import time
+
+import pytest
+
+from custom_components.gen2_wallbox.coordinator import GEN2WallboxCoordinator
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.gen2wallbox import (
+    GEN2_Wallbox,
+)
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.poll_rate import (
+    AdaptivePollInterval,
+)
+
+from .simulator import DEVICE_ID, GEN2_DPS, LOCAL_KEY, WallboxSimulator
+
+pytestmark = pytest.mark.usefixtures("socket_enabled")
+
+
+async def test_push_storm_keeps_consistency_read(hass):
+    """Pushes every 0.2 s do not hold off the poll every second."""
+    storm = [(0.2, {"106": 1235 + i}) for i in range(30)]
+    sim = WallboxSimulator(script=storm)
+    await sim.async_start()
+    wallbox = GEN2_Wallbox(DEVICE_ID, sim.host, LOCAL_KEY)
+    wallbox.device.port = sim.port
+    wallbox.consistency_interval = 0.5
+    wallbox.poll_rate = AdaptivePollInterval(active=1, idle=1)
+    coordinator = GEN2WallboxCoordinator(hass, wallbox)
+    pushed = []
+    coordinator.async_add_listener(lambda: pushed.append(coordinator.data))
+    try:
+        await coordinator.async_refresh()
+        reads = sim.requests
+        await asyncio.sleep(4)
+    finally:
+        await coordinator.async_shutdown()
+        await sim.async_stop()
+
+    assert len(pushed) > 10
+    assert sim.requests - reads >= 2
+
+
+async def test_restored_status_until_live(hass, hass_storage):
+    """The saved status is served as stale, pushes wait for the first read."""
+    saved_at = time.time() - 3600
+    hass_storage["gen2_wallbox.entry"] = {
+        "version": 1,
+        "key": "gen2_wallbox.entry",
+        "data": {"data": {"dps": {**GEN2_DPS, "106": 1000}}, "timestamp": saved_at},
+    }
+    sim = WallboxSimulator()
+    await sim.async_start()
+    wallbox = GEN2_Wallbox(DEVICE_ID, sim.host, LOCAL_KEY)
+    wallbox.device.port = sim.port
+    wallbox.consistency_interval = 0
+    coordinator = GEN2WallboxCoordinator(hass, wallbox, store_key="entry")
+    try:
+        await coordinator.async_restore()
+        assert wallbox.stale
+        assert wallbox.is_available() and not wallbox.available
+        assert coordinator.data["dps"]["106"] == 1000
+
+        # a partial report cannot be merged into an old status
+        wallbox._handle_push({"dps": {"106": 1100}})
+        assert coordinator.data["dps"]["106"] == 1000
+
+        await coordinator.async_refresh()
+        assert not wallbox.stale
+        assert coordinator.data["dps"]["106"] == GEN2_DPS["106"]
+    finally:
+        await coordinator.async_shutdown()
+        await sim.async_stop()
+
+    saved = hass_storage["gen2_wallbox.entry"]["data"]
+    assert saved["data"]["dps"]["106"] == GEN2_DPS["106"]
+    assert saved["timestamp"] > saved_at
@@ -0,0 +1,76 @@
+"""Following wallboxes by their LAN beacons."""
+import json
+import time
+
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.codec import (
+    TuyaCipher,
+    pack_message,
+)
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.discovery import (
+    UDP_KEY,
+    DiscoveryListener,
+    decode_beacon,
+)
+
+from .simulator import DEVICE_ID
+
+BEACON = {"ip": "192.168.1.20", "gwId": DEVICE_ID, "version": "3.3"}
+# discovery broadcasts use command 0x13
+UDP_NEW = 0x13
+
+CIPHER = TuyaCipher(UDP_KEY.decode("latin1"))
+
+
+def _plain(body: dict) -> bytes:
+    """Beacon on 6666, the JSON in clear text."""
+    payload = b"\x00\x00\x00\x00" + json.dumps(body).encode()
+    return pack_message(0, UDP_NEW, payload)
+
+
+def _encrypted(body: dict) -> bytes:
+    """Beacon on 6667, encrypted with the well known UDP key."""
+    payload = b"\x00\x00\x00\x00" + CIPHER.encrypt(json.dumps(body).encode())
+    return pack_message(0, UDP_NEW, payload)
+
+
+def test_decode_beacon():
+    assert decode_beacon(_plain(BEACON), CIPHER) == BEACON
+    assert decode_beacon(_encrypted(BEACON), CIPHER) == BEACON
+
+
+def test_address_is_the_sender():
+    """A beacon cannot redirect a wallbox to the address it claims."""
+    listener = DiscoveryListener()
+    listener.handle_beacon(_plain(BEACON), ("192.168.1.66", 6666))
+    assert listener.lookup(DEVICE_ID) == "192.168.1.66"
+    listener.handle_beacon(b"garbage", ("192.168.1.67", 6666))
+    assert listener.lookup(DEVICE_ID) == "192.168.1.66"
+    assert listener.beacons == 1
+
+
+def test_subscriber_called_on_changes_only():
+    listener = DiscoveryListener()
+    moves = []
+    unsubscribe = listener.subscribe(DEVICE_ID, moves.append)
+    listener.handle_beacon(_encrypted(BEACON), ("192.168.1.20", 6667))
+    listener.handle_beacon(_encrypted(BEACON), ("192.168.1.20", 6667))
+    listener.handle_beacon(_plain(BEACON), ("192.168.1.21", 6666))
+    listener.handle_beacon(_plain({**BEACON, "gwId": "other"}), ("10.0.0.9", 6666))
+    assert moves == ["192.168.1.20", "192.168.1.21"]
+
+    unsubscribe()
+    listener.handle_beacon(_plain(BEACON), ("192.168.1.22", 6666))
+    assert moves == ["192.168.1.20", "192.168.1.21"]
+
+
+def test_addresses_expire():
+    listener = DiscoveryListener(ttl=0.05)
+    moves = []
+    listener.subscribe(DEVICE_ID, moves.append)
+    listener.handle_beacon(_plain(BEACON), ("192.168.1.20", 6666))
+    assert listener.lookup(DEVICE_ID) == "192.168.1.20"
+    time.sleep(0.06)
+    assert listener.lookup(DEVICE_ID) is None
+    # back after expiry is news again
+    listener.handle_beacon(_plain(BEACON), ("192.168.1.20", 6666))
+    assert moves == ["192.168.1.20", "192.168.1.20"]
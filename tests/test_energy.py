@@ -0,0 +1,51 @@
+"""Energy integrated from the power samples."""
+import pytest
+
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.energy import EnergyMeter
+
+
+def test_trapezoid():
+    meter = EnergyMeter()
+    assert meter.add(0, 0) == 0
+    # ramp from 0 to 7200 W over a minute, then a minute flat
+    assert meter.add(60, 7200) == pytest.approx(60)
+    assert meter.add(120, 7200) == pytest.approx(120)
+    assert meter.total == pytest.approx(180)
+    assert meter.power == 7200
+
+
+def test_gap_is_bridged_by_the_counter():
+    meter = EnergyMeter(max_gap=150)
+    meter.add(0, 11000, counter=12.3)
+    # offline for 10 minutes, the counter went up by 1.8 kWh meanwhile
+    assert meter.add(600, 11000, counter=14.1) == pytest.approx(1800)
+    assert meter.gaps == 1
+    # without a counter the gap adds nothing
+    assert meter.add(1200, 11000) == 0
+    assert meter.gaps == 2
+    assert meter.total == pytest.approx(1800)
+
+
+def test_counter_reset_and_late_samples():
+    meter = EnergyMeter(max_gap=150)
+    meter.add(0, 0, counter=99.9)
+    assert meter.add(600, 0, counter=0.2) == 0
+    assert meter.counter_resets == 1
+    # integrated from the new counter value on
+    assert meter.add(1200, 0, counter=0.5) == pytest.approx(300)
+    assert meter.add(1100, 5000) == 0
+
+
+def test_restore_and_session():
+    meter = EnergyMeter()
+    meter.restore(5000.0, 400.0)
+    meter.add(0, 3600, charging=True)
+    meter.add(10, 3600, charging=True)
+    assert meter.total == pytest.approx(5010)
+    assert meter.session == pytest.approx(410)
+    meter.add(20, 0, charging=False)
+    # a new charging session starts from zero, the total goes on
+    meter.add(30, 3600, charging=True)
+    assert meter.session == pytest.approx(5)
+    assert meter.total == pytest.approx(5020)
+    assert meter.as_dict()["session_wh"] == 5.0
@@ -1,8 +1,51 @@
 """Test component setup."""
+import time
+
+from homeassistant.config_entries import ConfigEntryState
 from homeassistant.setup import async_setup_component
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
 
 from custom_components.gen2_wallbox.const import DOMAIN
 
+from .simulator import DEVICE_ID, LOCAL_KEY
+
+
 async def test_async_setup(hass):
     """Test the component gets setup."""
     assert await async_setup_component(hass, DOMAIN, {}) is True
+
+
+@pytest.mark.usefixtures("socket_enabled")
+async def test_offline_wallbox_is_retried(hass, monkeypatch):
+    """Setup gives up on a wallbox that does not answer, HA retries it."""
+    monkeypatch.setattr("custom_components.gen2_wallbox.FIRST_REFRESH_TIMEOUT", 1)
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        version=2,
+        data={
+            "deviceid": DEVICE_ID,
+            # nothing listens on the Tuya port here
+            "ip": "127.0.0.1",
+            "localkey": LOCAL_KEY,
+            "car_phases": 3,
+        },
+    )
+    entry.add_to_hass(hass)
+    start = time.monotonic()
+    assert not await hass.config_entries.async_setup(entry.entry_id)
+    assert entry.state is ConfigEntryState.SETUP_RETRY
+    assert time.monotonic() - start < 3
+
+
+async def test_removed_entry_deletes_saved_status(hass, hass_storage):
+    entry = MockConfigEntry(domain=DOMAIN, version=2, data={})
+    entry.add_to_hass(hass)
+    hass_storage[f"{DOMAIN}.{entry.entry_id}"] = {
+        "version": 1,
+        "key": f"{DOMAIN}.{entry.entry_id}",
+        "data": {"data": {"dps": {}}, "timestamp": 0},
+    }
+    await hass.config_entries.async_remove(entry.entry_id)
+    await hass.async_block_till_done()
+    assert f"{DOMAIN}.{entry.entry_id}" not in hass_storage
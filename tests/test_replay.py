@@ -0,0 +1,114 @@
+"""Recording the traffic of a wallbox and replaying it without the device."""
+import asyncio
+import json
+import math
+
+import pytest
+
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.gen2wallbox import (
+    GEN2_Wallbox,
+)
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.recording import (
+    ReplayClient,
+    TrafficRecorder,
+    load_events,
+)
+
+from .simulator import DEVICE_ID, GEN2_DPS, LOCAL_KEY, WallboxSimulator
+
+# an evening with the wallbox dropping off: connected, charging, one timeout
+EVENING = [
+    {"t": 0.0, "op": "start", "v": 1, "dev": DEVICE_ID},
+    {"t": 0.001, "op": "state", "state": "connected"},
+    {"t": 0.01, "op": "status", "ms": 200.0, "reply": {"dps": GEN2_DPS}},
+    {"t": 1.0, "op": "push", "reply": {"dps": {"101": "charing", "108": 160}}},
+    {"t": 2.0, "op": "status", "ms": 3000.0, "err": "no response"},
+    {"t": 5.0, "op": "state", "state": "disconnected"},
+    {"t": 6.0, "op": "status", "ms": 100.0, "reply": {"dps": GEN2_DPS}},
+]
+
+
+def _replayed(client: ReplayClient) -> GEN2_Wallbox:
+    wallbox = GEN2_Wallbox(DEVICE_ID, "replay", LOCAL_KEY, device=client)
+    wallbox.consistency_interval = 0
+    return wallbox
+
+
+async def test_replay_accelerated():
+    """Replies, latency and pushes of a recording at ten times the speed."""
+    client = ReplayClient(EVENING, speed=10)
+    wallbox = _replayed(client)
+    try:
+        await wallbox.async_update()
+        assert wallbox.is_available()
+        assert 0.02 <= wallbox.metrics.last_latency < 0.1
+        await asyncio.sleep(0.15)
+        assert wallbox.snapshot.state == "charging"
+
+        await wallbox.async_update()
+        assert not wallbox.is_available()
+        assert wallbox.status["message"] == "no response"
+        await wallbox.async_update()
+        assert wallbox.is_available()
+        await asyncio.sleep(0.5)
+        assert client.finished
+        assert not client.connected
+    finally:
+        await wallbox.async_close()
+
+
+async def test_recorder_buffers_until_flushed(tmp_path):
+    """Events reach the file only from the executor, the rest on close."""
+    path = str(tmp_path / "wallbox.jsonl")
+    recorder = TrafficRecorder.open(path, DEVICE_ID)
+    recorder.write("state", state="connected")
+    assert load_events(path) == []
+    await recorder.async_flush()
+    assert [event["op"] for event in load_events(path)] == ["start", "state"]
+    recorder.write("state", state="disconnected")
+    await recorder.async_close()
+    assert len(load_events(path)) == 3
+
+
+@pytest.mark.usefixtures("socket_enabled")
+async def test_record_and_replay(tmp_path):
+    """A lossy link replayed as fast as possible gives the same availability."""
+    path = str(tmp_path / "wallbox.jsonl")
+    sim = WallboxSimulator(loss=0.3, seed=2)
+    await sim.async_start()
+    wallbox = GEN2_Wallbox(DEVICE_ID, sim.host, LOCAL_KEY)
+    wallbox.device.port = sim.port
+    wallbox.device.timeout = 0.2
+    wallbox.consistency_interval = 0
+    await wallbox.async_start_recording(path)
+    recorded = []
+    try:
+        for _ in range(10):
+            await wallbox.async_update()
+            recorded.append(wallbox.is_available())
+        # the link is back for the write
+        sim.loss = 0
+        await wallbox.async_set_value("Set32A", 10)
+    finally:
+        await wallbox.async_close()
+        await sim.async_stop()
+
+    events = load_events(path)
+    with open(path, encoding="utf-8") as file:
+        assert all(json.loads(line)["t"] >= 0 for line in file)
+    assert [event["op"] for event in events].count("status") == 10
+
+    replay = _replayed(ReplayClient(events, speed=math.inf))
+    replayed = []
+    try:
+        for _ in range(10):
+            await replay.async_update()
+            replayed.append(replay.is_available())
+        await replay.async_set_value("Set32A", 10)
+    finally:
+        await replay.async_close()
+
+    assert replayed == recorded
+    assert replay._dps_data["dps"] == wallbox._dps_data["dps"]
+    assert replay.snapshot.setpoint == 10
+    assert replay.device.finished
@@ -0,0 +1,26 @@
+"""Services changing the charging current."""
+import pytest
+import voluptuous as vol
+
+from homeassistant.exceptions import HomeAssistantError
+
+from custom_components.gen2_wallbox.const import DOMAIN
+from custom_components.gen2_wallbox.services import async_setup_services
+
+
+async def test_target_is_required(hass):
+    """Raising every charger to its maximum takes an explicit target."""
+    hass.data[DOMAIN] = {}
+    async_setup_services(hass)
+    with pytest.raises(vol.Invalid):
+        await hass.services.async_call(
+            DOMAIN, "set_maximal_current", {}, blocking=True
+        )
+    with pytest.raises(HomeAssistantError, match="No GEN2 wallbox targeted"):
+        await hass.services.async_call(
+            DOMAIN,
+            "set_maximal_current",
+            {"entity_id": "number.somewhere_else"},
+            blocking=True,
+            return_response=True,
+        )
@@ -0,0 +1,45 @@
+"""Charging current following the solar surplus."""
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.surplus import (
+    SurplusController,
+)
+
+
+def _controller():
+    return SurplusController(8, 16, hysteresis=230, min_interval=30)
+
+
+def test_hysteresis():
+    controller = _controller()
+    # 10 A on three phases draw 6900 W, a small import or export is ignored
+    assert controller.target(0, 6900, 10, 230, 3, now=0) is None
+    assert controller.target(200, 6900, 10, 230, 3, now=0) is None
+    assert controller.target(-900, 6900, 10, 230, 3, now=0) is None
+    # 1380 W export is 2 A more
+    assert controller.target(-1380, 6900, 10, 230, 3, now=0) == 12
+
+
+def test_increase_rate_limited_decrease_at_once():
+    controller = _controller()
+    assert controller.target(-1380, 6900, 10, 230, 3, now=0) == 12
+    assert controller.target(-2070, 8280, 12, 230, 3, now=10) is None
+    # importing again: lowered right away
+    assert controller.target(2000, 8280, 12, 230, 3, now=11) == 9
+    assert controller.target(-2070, 6210, 9, 230, 3, now=31) == 12
+
+
+def test_limits():
+    controller = _controller()
+    # no surplus at all keeps the minimal current, it does not stop the car
+    assert controller.target(10000, 5520, 8, 230, 3, now=0) is None
+    assert controller.target(10000, 6900, 10, 230, 3, now=0) == 8
+    assert controller.target(-20000, 6900, 10, 230, 3, now=0) == 16
+    controller.max_current = 13
+    assert controller.target(-20000, 6900, 10, 230, 3, now=100) == 13
+
+
+def test_phases():
+    """The same export is worth three times the amps on one phase."""
+    assert _controller().target(-460, 2300, 10, 230, 1, now=0) == 12
+    assert _controller().target(-460, 6900, 10, 230, 3, now=0) is None
+    # a higher measured voltage means fewer amps for the same power
+    assert _controller().target(-1380, 6900, 10, 240, 3, now=0) == 11
@@ -0,0 +1,40 @@
+"""Coalescing write queue."""
+import asyncio
+
+import pytest
+
+from custom_components.gen2_wallbox.gen2_wallbox_tinytuya.writer import (
+    CoalescingWriter,
+)
+
+
+async def test_burst_is_one_write():
+    writes = []
+
+    async def write(values):
+        writes.append(values)
+        return values
+
+    writer = CoalescingWriter(write, min_interval=0)
+    waiters = [writer.submit("Set32A", value) for value in range(8, 17)]
+    assert await asyncio.gather(*waiters) == [{"Set32A": 16}] * 9
+    assert writes == [{"Set32A": 16}]
+
+
+async def test_cancel_releases_write_in_flight():
+    """A caller awaiting a write does not hang when the queue is stopped."""
+    started = asyncio.Event()
+
+    async def write(values):
+        started.set()
+        await asyncio.sleep(60)
+
+    writer = CoalescingWriter(write)
+    in_flight = writer.submit("Set32A", 10)
+    await started.wait()
+    queued = writer.submit("Set32A", 12)
+    await writer.async_cancel()
+    assert in_flight.cancelled()
+    assert queued.cancelled()
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(in_flight, 1)